@@ -4,10 +4,13 @@ Created on Wed Apr  3 19:03:05 2024
 
 @author: mcustado
 """
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 import scipy.optimize as opt
 import lake_balance_functions as lbf
+import lake_balance_results as lbr
+import lake_balance_montecarlo as lbm
 
 ################ 1. Input parameters ################
 
@@ -41,63 +44,112 @@ dX_S_O_unc = [2,1,1,0.9] # per mil
 dX_I_O_unc = 2 # per mil
 E_I_unc = 0.1
 
+## Output folder for figures (None = figures are only shown)
+
+fig_dir = None
+dpi = 600
+
+## Output file for the summary statistics of X per period (.json, .csv or .parquet; None = print only)
+
+results_file = None
+
 ################ 2. Run simulations ################
 
 ## Input number of simulations
 
 sim = 100000
 
-## Initialize input distributions
+## Optional: low-memory mode. Draws are generated and evaluated in blocks of chunk draws (peak memory set by chunk,
+## not by sim), in float32 or float64 (see lake_balance_montecarlo). The plots use the first plot_sample draws
+
+low_memory = False
+precision = 'float32'
+chunk = 10**6
+plot_sample = 20000
 
 # initialize index
 index = np.arange(0,4,1) 
 
-# initialize input arrays
-hum_in = []
-temp_in = []
-lake_in = []
-
-# input input distributions: loop through different periods, create temp array for each input parameter (hum, temp, lake)
-for i in index:
-    print(i)
-
-    hum_temp = np.random.default_rng().normal(hum-hum_dec[i], hum_unc, sim)
-    hum_in.append(hum_temp)
-
-    temp_temp = np.random.default_rng().normal(temp+temp_inc[i], temp_unc, sim)
-    temp_in.append(temp_temp)
+if low_memory:
+
+    hum_in = []
+    temp_in = []
+    lake_in = []
+    x_array = []
+    summaries = []
+
+    for i in index:
+        inputs = {'h': ('normal', hum-hum_dec[i], hum_unc),
+                  'temp': ('normal', temp+temp_inc[i], temp_unc),
+                  'dX_P': dX_P[i],
+                  'dX_S': ('uniform', dX_S[i]-dX_S_O_unc[i], dX_S[i]+dX_S_O_unc[i]),
+                  'dX_I': dX_I[i]}
+        run = lbm.run_ensemble('d18O', inputs, sim, k=k[i], dtype=precision, chunk=chunk, keep=plot_sample,
+                               period=period[i])
+        summaries.append(dict(run['records'][0], variable='x'))
+        hum_in.append(run['sample']['h'])
+        temp_in.append(run['sample']['temp'])
+        lake_in.append(run['sample']['dX_S'])
+        x_array.append(run['sample']['X'])
+
+else:
+
+    ## Initialize input distributions
+
+    # initialize input arrays
+    hum_in = []
+    temp_in = []
+    lake_in = []
+
+    # input input distributions: loop through different periods, create temp array for each input parameter (hum, temp, lake)
+    for i in index:
+        print(i)
+
+        hum_temp = np.random.default_rng().normal(hum-hum_dec[i], hum_unc, sim)
+        hum_in.append(hum_temp)
+
+        temp_temp = np.random.default_rng().normal(temp+temp_inc[i], temp_unc, sim)
+        temp_in.append(temp_temp)
     
-    lake_temp = np.random.default_rng().uniform(dX_S[i]-dX_S_O_unc[i], dX_S[i]+dX_S_O_unc[i], sim)
-    lake_in.append(lake_temp)
+        lake_temp = np.random.default_rng().uniform(dX_S[i]-dX_S_O_unc[i], dX_S[i]+dX_S_O_unc[i], sim)
+        lake_in.append(lake_temp)
 
-## Calculate for x
+    ## Calculate for x
 
-# initialize output array
-x_array = []
+    # initialize output array
+    x_array = []
 
-for i in index:
-    x_temp = [] # create temporary output array
+    for i in index:
+        x_temp = [] # create temporary output array
     
-    for ind in np.arange(0,sim,1):
-        print(ind)
-        roots = opt.fsolve(lbf.calc_x, E_I, args = (lake_in[i][ind], dX_I[i], dX_P[i], hum_in[i][ind], temp_in[i][ind]))
-        x_temp = np.append(x_temp, roots[0])
+        for ind in np.arange(0,sim,1):
+            print(ind)
+            roots = opt.fsolve(lbf.calc_x, E_I, args = (lake_in[i][ind], dX_I[i], dX_P[i], hum_in[i][ind], temp_in[i][ind]))
+            x_temp = np.append(x_temp, roots[0])
         
-    x_array.append(x_temp)
+        x_array.append(x_temp)
+
+# summarize and print results for X in each period
 
-# print results for X in each period
+records = []
 
 for i in index:
 
+    rec = summaries[i] if low_memory else lbr.summarize({'x': x_array[i]}, iso='d18O', period=period[i])[0]
+    records.append(rec)
+
     print("period: ", period[i])
     print("number of simulations: ", sim)
     print("output: x")
     
-    print("mean output: \t", np.nanmean(x_array[i]))
-    print("15.9 perc output: \t", np.percentile(x_array[i], 15.9))
-    print("84.1 perc output: \t", np.percentile(x_array[i], 84.1))
-    print("minimum output: \t", np.min(x_array[i]))
-    print("maximum output: \t", np.max(x_array[i]), "\n")
+    print("mean output: \t", rec['mean'])
+    print("15.9 perc output: \t", rec['p15.9'])
+    print("84.1 perc output: \t", rec['p84.1'])
+    print("minimum output: \t", rec['min'])
+    print("maximum output: \t", rec['max'], "\n")
+
+if results_file:
+    lbr.write_records(records, results_file)
 
 ################ 3. Plot dX_S, humidity, temperatuve vs X in different scenarios ################
 
@@ -130,8 +182,9 @@ for i in index: # loop through the four scenarios (first to last output plots: L
     print("slope: \t",m)
     print("y-int: \t",b)
     
-plt.tight_layout()
-# plt.savefig('.....\\'+period[i]+'.png', bbox_inches="tight", dpi=600)
+    plt.tight_layout()
+    if fig_dir:
+        plt.savefig(os.path.join(fig_dir, period[i]+'.png'), bbox_inches="tight", dpi=dpi)
 
 ################ 4. Plot all dX_S, humidity, temperatuve vs X scenarios in one field ################
 
@@ -158,7 +211,8 @@ for i in index: # loop through the four scenarios (first to last output plots: L
     ax1.grid(visible=True, alpha = 0.5)
     
 plt.tight_layout()
-# plt.savefig('.....\\all_scenarios_plot.png', bbox_inches="tight", dpi=600)
+if fig_dir:
+    plt.savefig(os.path.join(fig_dir, 'all_scenarios_plot.png'), bbox_inches="tight", dpi=dpi)
 
 fig, (ax2, ax3) = plt.subplots(1,2, figsize=(16,7), sharey=True)
 
@@ -180,4 +234,5 @@ for i in index: # loop through the four scenarios (first to last output plots: L
     ax3.grid(visible=True, alpha = 0.5)
     
 plt.tight_layout()
-# plt.savefig('.....\\all_scenarios_plots_for_supp2.png', bbox_inches="tight", dpi=600)
+if fig_dir:
+    plt.savefig(os.path.join(fig_dir, 'all_scenarios_plots_for_supp2.png'), bbox_inches="tight", dpi=dpi)
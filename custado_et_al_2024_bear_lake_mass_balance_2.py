@@ -5,8 +5,11 @@ Created on Wed Apr  3 19:03:05 2024
 @author: mcustado
 """
 
+import numpy as np
 import scipy.optimize as opt
 import lake_balance_functions as lbf
+import lake_balance_continuation as lbc
+import lake_balance_discharge as lbq
 
 ################ 1. Input parameters ################
 
@@ -76,6 +79,17 @@ f_creek2 = 145049044.909472
 f_precip2 = 107856450.331302
 f_outlet2 = 352639058.615613
 
+# Optional: derive f_inlet, f_creek and f_outlet from local daily discharge records of the gauges in stations_used.csv
+
+use_gauge_fluxes = False
+discharge_dir = 'discharge' # Folder with daily discharge files named <station id>.rdb or <station id>.csv
+flux_years = None # Year or list of years to average (None = all years with complete records)
+
+if use_gauge_fluxes:
+    store = lbq.update_store(discharge_dir + '/discharge_store.csv', discharge_dir)
+    gauge = lbq.gauge_fluxes(store, period=flux_years)
+    f_inlet2, f_creek2, f_outlet2 = gauge['f_inlet'], gauge['f_creek'], gauge['f_outlet']
+
 # Input initial guesses for output variables (f_gwater, f_evap, x_, h, dX_I_O, dX_I_D)
 
 initial_guesses = [0, 231211349.583575, 0.435, 0.76, -16.2150279446561, -122.143792918018]
@@ -92,3 +106,20 @@ print("f_gwater_soln:", f_gwater_soln, "\nf_evap_soln:", f_evap_soln,
       
       "\n\nf_inlet:", f_inlet2, "\nf_creek:", f_creek2,
       "\nf_precip:", f_precip2, "\nf_outlet:", f_outlet2)
+
+################ 3. Continuation sweep (optional) ################
+
+### Trace the solution while varying an input (e.g. f_outlet or f_precip), warm-starting each point from its neighbour
+
+run_sweep = False
+
+sweep_param = 'f_outlet' # Any hydro_balance input: f_inlet, f_creek, f_precip, f_outlet, dX_S_O, ...
+sweep_values = np.linspace(0.8*f_outlet2, 1.2*f_outlet2, 101)
+
+if run_sweep:
+    
+    sweep_args = lbc.balance_args(temp, lake_O, lake_D, precip_O, precip_D, f_inlet2, f_creek2, f_precip2, f_outlet2)
+    
+    sweep_out = lbc.sweep(sweep_param, sweep_values, sweep_args, guess=roots)
+    
+    print(sweep_out.to_string())
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:17 2026
+
+@author: mcustado
+"""
+import lake_balance_mcmc as lbm
+
+################ 1. Input parameters ################
+
+# Known discharge values (m3/yr):
+
+fluxes = {'f_inlet': 317867056.26687,
+          'f_creek': 145049044.909472,
+          'f_precip': 107856450.331302,
+          'f_outlet': 352639058.615613}
+
+# Observed steady-state lake composition and uncertainty (per mil)
+
+obs = {'dX_S_O': -8.75978345841666,
+       'dX_S_D': -86.4422222222222,
+       'sd_O': 0.1,
+       'sd_D': 0.5}
+
+# Fixed parameters (climate data, evaporation flux-weighted precipitation, seasonality constant, end-members)
+
+fixed = dict(lbm.fixed)
+fixed['temp'] = 11.15
+fixed['dX_P_O'] = -11.70
+fixed['dX_P_D'] = -84.02
+
+# Priors for calibrated parameters: ('uniform', low, high) or ('normal', mean, sd)
+
+priors = {'h': ('uniform', 0.4, 0.95),
+          'f_gwater': ('uniform', 0, 300000000),
+          'dX_gwater_O': ('normal', -17.7983116883116, 0.5),
+          'dX_gwater_D': ('normal', -135.735649350649, 4)}
+
+# Sampler settings
+
+n_walkers = 32
+n_steps = 20000
+burn = 5000
+thin = 10
+
+################ 2. Run calibration ################
+
+result = lbm.calibrate(priors, fixed, obs, fluxes, n_walkers=n_walkers, n_steps=n_steps, burn=burn, thin=thin)
+
+# Print posterior summaries (h, f_gwater, end-members, and derived x, f_evap, dX_I_O, dX_I_D)
+
+lbm.print_summary(result)
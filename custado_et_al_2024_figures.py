@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:28:50 2026
+
+@author: mcustado
+"""
+import lake_balance_figures as lbfig
+
+################ 1. Build settings ################
+
+out_dir = 'figures' # Output folder for the figure files
+formats = ['png', 'pdf'] # Output formats
+dpi = 600
+figures = None # List of figures to build, e.g. ['figure_4', 'figure_5'] (None = all figures in custado_et_al_2024_plots)
+workers = None # Number of worker processes (None = one per figure, up to the number of cores)
+force = False # Re-render figures even if their inputs have not changed
+
+# Input file paths are set in custado_et_al_2024_plots.paths
+
+################ 2. Build figures ################
+
+if __name__ == '__main__':
+    
+    status = lbfig.build_figures(out_dir, figures, formats, dpi, workers, force)
+    
+    for name, result in status.items():
+        print(name + ":\t", result)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:42:48 2026
+
+@author: mcustado
+"""
+import lake_balance_scenarios as lbs
+
+########################## 1. Input parameters ##########################
+
+## Drivers to vary: a list of values or a (low, high) range for any of hum, temp, k, dX_P, dX_S, dX_I and their
+## uncertainties (hum_unc, temp_unc, dX_P_unc, dX_S_unc, dX_I_unc). Drivers not listed keep their base_period values
+## (see lbs.period_drivers).
+
+iso = 'd18O'
+base_period = 'current'
+
+drivers = {'hum': (0.42, 0.72), # mean humidity
+           'temp': (4, 13), # mean temperature (oC)
+           'k': [0.5, 0.75, 1], # seasonality factor
+           'dX_S': (-13.5, -7)} # lake steady-state composition (per mil)
+
+method = 'factorial' # 'factorial', 'random' or 'lhs'
+levels = 11 # values per range in the factorial design
+n_scenarios = 5000 # number of scenarios of the random/lhs designs
+
+sim = 2000 # Monte Carlo draws per scenario
+quantiles = (2.5, 15.9, 50, 84.1, 97.5)
+seed = 0
+
+out_file = None # Output table path (CSV), e.g. 'scenario_explorer.csv'
+
+########################## 2. Run scenarios ##########################
+
+scenarios = lbs.design(drivers, iso, base_period, method, n=n_scenarios, levels=levels, seed=seed)
+table = lbs.explore(scenarios, iso, n=sim, quantiles=quantiles, seed=seed)
+
+print("number of scenarios: ", len(table))
+print("number of simulations per scenario: ", sim)
+
+# Median X over humidity and temperature (averaged over the other drivers)
+
+print(table.pivot_table(index='hum', columns='temp', values='p50').round(3))
+
+if out_file:
+    table.to_csv(out_file, index=False)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:22:25 2026
+
+@author: mcustado
+"""
+import lake_balance_scenarios as lbs
+
+########################## 1. Input parameters ##########################
+
+## Scenario inputs (humidity, temperature, dX_P, dX_S, dX_I and uncertainties for the LIG, current, future
+## and glacial periods) are defined in lake_balance_scenarios. Edit lbs.climate and lbs.scenario_inputs to change them.
+
+isos = ['d18O'] # isotopes with period inputs in lbs.scenario_inputs
+periods = ['lig', 'current', 'future', 'glacial']
+
+n = 1024 # Base sample size of the Saltelli design (shared by all period/isotope combinations)
+
+out_file = None # Output table path (CSV), e.g. 'sobol_scenarios.csv'
+
+########################## 2. Run sensitivity analysis ##########################
+
+Si = lbs.batched_sobol(n, isos=isos, periods=periods)
+
+# Print first order and total indices per isotope and period
+
+for index in ['S1', 'ST']:
+    print("\n" + index + ":")
+    print(Si[Si['index'] == index].pivot_table(index=['iso', 'period'], columns='param', values='value'))
+
+if out_file:
+    Si.to_csv(out_file, index=False)
+
+# ST: Total sensitivity, S1: First order sensitivity, S2: Second order sensitivity; conf: Confidence interval
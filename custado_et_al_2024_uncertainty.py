@@ -7,6 +7,9 @@ Created on Wed Apr  3 14:26:14 2024
 
 import numpy as np
 import lake_balance_functions as lbf
+import lake_balance_discharge as lbq
+import lake_balance_results as lbr
+import lake_balance_montecarlo as lbm
 
 ########################## 1. Input parameters ##########################
 
@@ -41,6 +44,21 @@ dX_I_D = -122.145607652468
 
 iso_D = [k_D, dX_S_D, dX_I_D, dX_P_D] # Place in one array
 
+## Flux data
+
+total_inflow = 570772551.507645 # Input total annual volumetric inflow (m3/yr)
+
+# Optional: derive total inflow from local daily discharge records of the gauges in stations_used.csv
+
+use_gauge_fluxes = False
+discharge_dir = 'discharge' # Folder with daily discharge files named <station id>.rdb or <station id>.csv
+flux_years = None # Year or list of years to average (None = all years with complete records)
+f_precip = 107856450.331302 # Direct precipitation on the lake (m3/yr)
+
+if use_gauge_fluxes:
+    store = lbq.update_store(discharge_dir + '/discharge_store.csv', discharge_dir)
+    total_inflow = lbq.total_inflow(lbq.gauge_fluxes(store, period=flux_years), f_precip)
+
 
 ########################## 2. Input uncertainties ##########################
 
@@ -84,58 +102,88 @@ else:
 
 sim = 100000
 
-## Initialize arrays of input distributions
+# Optional: write the summary statistics to a .json, .csv or .parquet file (None = print only)
+
+results_file = None
+
+# Optional: low-memory mode. Draws are generated and evaluated in blocks of chunk draws, so peak memory is set by
+# chunk and not by sim; precision 'float32' halves the memory per draw (see lake_balance_montecarlo for its accuracy)
+
+low_memory = False
+precision = 'float32'
+chunk = 10**6
 
-hum_dist = np.random.default_rng().uniform(hum-unc_in[0], hum+unc_in[0], sim)
-temp_dist = np.random.default_rng().uniform(temp-unc_in[1], temp+unc_in[1], sim)
+if low_memory:
 
-dX_P_dist = np.random.default_rng().uniform(iso_in[3]-unc_in[2], iso_in[3]+unc_in[2], sim)
-dX_S_dist = np.random.default_rng().uniform(iso_in[1]-unc_in[3], iso_in[1]+unc_in[3], sim)
-dX_I_dist = np.random.default_rng().uniform(iso_in[2]-unc_in[4], iso_in[2]+unc_in[4], sim)
+    inputs = {'h': ('uniform', hum-unc_in[0], hum+unc_in[0]),
+              'temp': ('uniform', temp-unc_in[1], temp+unc_in[1]),
+              'dX_P': ('uniform', iso_in[3]-unc_in[2], iso_in[3]+unc_in[2]),
+              'dX_S': ('uniform', iso_in[1]-unc_in[3], iso_in[1]+unc_in[3]),
+              'dX_I': ('uniform', iso_in[2]-unc_in[4], iso_in[2]+unc_in[4])}
 
-## Initialize output arrays
+    run = lbm.run_ensemble(iso, inputs, sim, k=iso_in[0], total_inflow=total_inflow, dtype=precision, chunk=chunk)
+    records = run['records']
 
-x_dist = []
-dX_A_dist = []
-dX_E_dist = []
-E_dist = []
+    print("Isotope:\t",iso,
+        "\nNumber of simulations:\t", sim)
+    for rec in records:
+        lbr.print_record(rec)
 
-## Run mass balance function simulations
+else:
+
+    ## Initialize arrays of input distributions
+
+    hum_dist = np.random.default_rng().uniform(hum-unc_in[0], hum+unc_in[0], sim)
+    temp_dist = np.random.default_rng().uniform(temp-unc_in[1], temp+unc_in[1], sim)
+
+    dX_P_dist = np.random.default_rng().uniform(iso_in[3]-unc_in[2], iso_in[3]+unc_in[2], sim)
+    dX_S_dist = np.random.default_rng().uniform(iso_in[1]-unc_in[3], iso_in[1]+unc_in[3], sim)
+    dX_I_dist = np.random.default_rng().uniform(iso_in[2]-unc_in[4], iso_in[2]+unc_in[4], sim)
 
-for ind in np.arange(0,sim,1):
-    print(ind)
+    ## Initialize output arrays
 
-    # Calculate fractionation factors
+    x_dist = []
+    dX_A_dist = []
+    dX_E_dist = []
+    E_dist = []
 
-    alfa = lbf.fractionation_factor_d18O(temp_dist[ind])  
-    ep_eq = (alfa - 1)*1000
-    ep_k = lbf.kinetic_en_d18O(hum_dist[ind])
+    ## Run mass balance function simulations
+
+    for ind in np.arange(0,sim,1):
+        print(ind)
+
+        # Calculate fractionation factors
+
+        alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp_dist[ind], hum_dist[ind])
     
-    # Calculate isotopic composition of atmospheric moisture
+        # Calculate isotopic composition of atmospheric moisture
         
-    dX_A = lbf.isotope_atm(dX_P_dist[ind], ep_eq, iso_in[0])
-    dX_A_dist.append(dX_A)
+        dX_A = lbf.isotope_atm(dX_P_dist[ind], ep_eq, iso_in[0])
+        dX_A_dist.append(dX_A)
     
-    # Calculate isotopic composition of evaporate
+        # Calculate isotopic composition of evaporate
     
-    dX_E = lbf.isotope_evap(hum_dist[ind], ep_k, ep_eq, alfa, dX_A, dX_S_dist[ind])
-    dX_E_dist.append(dX_E)
+        dX_E = lbf.isotope_evap(hum_dist[ind], ep_k, ep_eq, alfa, dX_A, dX_S_dist[ind])
+        dX_E_dist.append(dX_E)
 
-    # Calculate X
+        # Calculate X
 
-    x_ = lbf.E_I(hum_dist[ind], ep_k, ep_eq, alfa, dX_A, dX_S_dist[ind], dX_I_dist[ind]) 
+        x_ = lbf.E_I(hum_dist[ind], ep_k, ep_eq, alfa, dX_A, dX_S_dist[ind], dX_I_dist[ind]) 
 
-    x_dist.append(x_)
+        x_dist.append(x_)
     
-    # Calculate actual evaporation rate (m3/day)
+        # Calculate actual evaporation rate (m3/day)
     
-    E_ = x_*570772551.507645 # Input total annual volumetric inflow (m3/day)
+        E_ = x_*total_inflow # Total annual volumetric inflow (m3/yr)
     
-    E_dist.append(E_)
+        E_dist.append(E_)
     
-## Print results
+    ## Print results
+
+    records = lbf.print_results_unc(iso, sim, x_dist, dX_E_dist, dX_A_dist, E_dist)
 
-lbf.print_results_unc(iso, sim, x_dist, dX_E_dist, dX_A_dist, E_dist)
+if results_file:
+    lbr.write_records(records, results_file)
 
 
 
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:25:07 2026
+
+@author: mcustado
+"""
+import os
+import numpy as np
+import pandas as pd
+
+########## Evaporation flux-weighted climate and precipitation isotope inputs #################
+
+# Computes the evaporation flux-weighted temperature, humidity and precipitation isotope composition used as inputs
+# to the mass balance (temp = 11.15, hum = 0.62, dX_P = -11.70 / -84.02 in the scripts) from local hourly or daily
+# meteorological series and precipitation isotope data.
+
+# Long series are read in chunks and reduced, per station and month, to additive sums (sum of weights, of weighted
+# temperature, of weighted humidity). Any coarser aggregation (year, evaporation season, N-year rolling windows) is
+# then a ratio of summed sums, so the full record is never held in memory and rolling windows stay exact.
+
+# Evaporation weights:
+    # if the series has an evaporation column (e.g. pan evaporation, mm), it is used directly
+    # otherwise a Dalton-type mass transfer proxy is used: E ~ e_s(T)*(1 - h)*(wind speed, if available),
+    # with e_s the saturation vapour pressure (kPa, Magnus formula)
+
+# Expected columns (renamed with the columns argument): datetime, temp (deg C), rh, and optionally evap, wind, station
+
+met_columns = {'datetime': 'datetime', 'temp': 'temp', 'rh': 'rh', 'evap': 'evap', 'wind': 'wind', 'station': 'station'}
+
+season_months = (5, 6, 7, 8, 9, 10)
+
+sum_columns = ['w', 'w_temp', 'w_hum', 'n']
+
+#%% Evaporation weights
+
+def saturation_vapor_pressure(temp): # Temperature in deg C, output in kPa
+    return 0.6108*np.exp(17.27*temp/(temp + 237.3))
+
+def evaporation_weight(temp, hum, wind=None):
+    w = saturation_vapor_pressure(temp)*(1 - hum)
+    if wind is not None:
+        w = w*wind
+    return np.clip(w, 0, None)
+
+#%% Chunked reading and monthly sums
+
+# Yield chunks of a meteorological CSV file with standardized column names
+
+def read_met(path, chunksize=500000, columns=met_columns):
+    rename = {v: k for k, v in columns.items()}
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in header if c in rename]
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols):
+        yield chunk.rename(columns=rename)
+
+# Reduce chunks of a met series to monthly sums per station.
+# rh_units: 'percent' or 'fraction'. Rows with missing temperature or humidity are skipped
+
+def monthly_sums(chunks, rh_units='percent', station=None):
+    parts = []
+    for chunk in chunks:
+        t = pd.to_datetime(chunk['datetime'], errors='coerce')
+        temp = pd.to_numeric(chunk['temp'], errors='coerce').to_numpy(dtype=float)
+        hum = pd.to_numeric(chunk['rh'], errors='coerce').to_numpy(dtype=float)
+        if rh_units == 'percent':
+            hum = hum/100
+
+        if 'evap' in chunk:
+            w = pd.to_numeric(chunk['evap'], errors='coerce').to_numpy(dtype=float)
+        else:
+            wind = pd.to_numeric(chunk['wind'], errors='coerce').to_numpy(dtype=float) if 'wind' in chunk else None
+            w = evaporation_weight(temp, hum, wind)
+
+        ok = np.isfinite(temp) & np.isfinite(hum) & np.isfinite(w) & t.notna().to_numpy()
+        sums = pd.DataFrame({'station': chunk['station'].astype(str).to_numpy() if 'station' in chunk else station,
+                             'year': t.dt.year.to_numpy(),
+                             'month': t.dt.month.to_numpy(),
+                             'w': w, 'w_temp': w*temp, 'w_hum': w*hum, 'n': 1})[ok]
+        parts.append(sums.groupby(['station', 'year', 'month'], dropna=False)[sum_columns].sum())
+
+    monthly = pd.concat(parts).groupby(level=[0, 1, 2], dropna=False).sum().reset_index()
+    monthly[['year', 'month']] = monthly[['year', 'month']].astype(int)
+    return monthly
+
+# Monthly sums for several files (one station per file, named after the file, unless the files have a station column)
+
+def met_monthly(paths, chunksize=500000, rh_units='percent', columns=met_columns):
+    if isinstance(paths, str):
+        paths = [paths]
+    return pd.concat([monthly_sums(read_met(p, chunksize, columns), rh_units,
+                                   station=os.path.splitext(os.path.basename(p))[0]) for p in paths],
+                     ignore_index=True)
+
+#%% Weighted inputs
+
+# Evaporation flux-weighted inputs per year (period='year') or per evaporation season (period='season').
+# precip_iso: optional DataFrame with year, month, d18O, dD (and optionally amount, mm) of precipitation;
+#   the isotope values are weighted by the monthly evaporation weight (times the amount, if given).
+# by_station: keep stations separate (otherwise all stations are pooled)
+# window: optional N-period rolling window (exact: sums are rolled before taking ratios)
+# Returns a DataFrame with temp, hum, dX_P_O, dX_P_D and the summed weight per period
+
+def weighted_inputs(monthly, precip_iso=None, period='year', months=season_months, by_station=False, window=None):
+    sums = period_sums(monthly, precip_iso, period, months, by_station)
+
+    if window:
+        level = 'station' if by_station else None
+        if level:
+            sums = sums.groupby(level=level, group_keys=False).apply(lambda g: g.rolling(window).sum())
+        else:
+            sums = sums.rolling(window).sum()
+
+    return _ratios(sums, precip_iso is not None).reset_index()
+
+# Additive sums behind weighted_inputs (w, w_temp, w_hum, n and, with precip_iso, wp_O, wpx_O, wp_D, wpx_D) per
+# year (and station); precipitation weights use the evaporation weight of the same year and month
+
+def period_sums(monthly, precip_iso=None, period='year', months=season_months, by_station=False):
+    m = monthly
+    if period == 'season':
+        m = m[m['month'].isin(months)]
+
+    keys = ['station', 'year'] if by_station else ['year']
+    sums = m.groupby(keys)[sum_columns].sum()
+
+    if precip_iso is not None:
+        p = precip_iso.copy()
+        if 'amount' not in p:
+            p['amount'] = 1.0
+        w_month = m.groupby(['year', 'month'])['w'].sum().rename('w_month').reset_index()
+        p = p.merge(w_month, on=['year', 'month'])
+        p['wp'] = p['w_month']*p['amount']
+        for iso, col in (('O', 'd18O'), ('D', 'dD')):
+            p['wp_' + iso] = np.where(p[col].notna(), p['wp'], 0)
+            p['wpx_' + iso] = p['wp_' + iso]*p[col].fillna(0)
+        psums = p.groupby('year')[['wp_O', 'wpx_O', 'wp_D', 'wpx_D']].sum()
+        sums = sums.join(psums, on='year') if by_station else sums.join(psums)
+    return sums
+
+def _ratios(sums, precip):
+    out = pd.DataFrame(index=sums.index)
+    out['temp'] = sums['w_temp']/sums['w']
+    out['hum'] = sums['w_hum']/sums['w']
+    if precip:
+        out['dX_P_O'] = sums['wpx_O']/sums['wp_O']
+        out['dX_P_D'] = sums['wpx_D']/sums['wp_D']
+    out['weight'] = sums['w']
+    out['n'] = sums['n']
+    return out
+
+# Single set of inputs over a range of years (e.g. the study period), ready for the mass balance functions
+
+def period_inputs(monthly, precip_iso=None, years=None, period='season', months=season_months):
+    m = monthly if years is None else monthly[monthly['year'].isin(years)]
+    p = precip_iso
+    if p is not None and years is not None:
+        p = p[p['year'].isin(years)]
+    # Sums per actual year (precipitation weighted by the evaporation weight of its own year and month), then added
+    sums = period_sums(m, p, period, months).sum().to_frame().T
+    row = _ratios(sums, p is not None).iloc[0]
+    return {key: row[key] for key in ('temp', 'hum', 'dX_P_O', 'dX_P_D') if key in row}
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:23:07 2026
+
+@author: mcustado
+"""
+import numpy as np
+import pandas as pd
+import scipy.optimize as opt
+import lake_balance_functions as lbf
+
+########## Continuation sweeps of the hydrological balance (Section 5.2.2) #################
+
+# Traces the solution of lbf.hydro_balance (f_gwater, f_evap, x_, h, dX_I_O, dX_I_D) while one or two inputs
+# (e.g. f_outlet or f_precip) are varied. Each point is warm-started from its neighbour with a secant predictor,
+# so dense sweeps need a couple of iterations per point instead of cold starts from hand-tuned guesses.
+# If a point does not converge, the step is bisected before the point is flagged as failed.
+# Folds are flagged where the determinant of the Jacobian changes sign along the path, and branch jumps
+# where the converged solution lands far from the predicted one.
+
+unknowns = ['f_gwater', 'f_evap', 'x', 'h', 'dX_I_O', 'dX_I_D']
+
+arg_names = ['dX_S_O', 'dX_S_D', 'dX_A_O', 'dX_A_D', 'f_inlet', 'f_creek', 'f_precip', 'f_outlet',
+             'alfa_O', 'ep_eq_O', 'alfa_D', 'ep_eq_D']
+
+#%% Inputs
+
+# hydro_balance arguments from climate and isotope data, as in custado_et_al_2024_bear_lake_mass_balance_2
+
+def balance_args(temp=11.15, lake_O=-8.75978345841666, lake_D=-86.4422222222222, precip_O=-11.70, precip_D=-84.02,
+                 f_inlet=317867056.26687, f_creek=145049044.909472, f_precip=107856450.331302,
+                 f_outlet=352639058.615613, k=1):
+    alfa_O = lbf.fractionation_factor_d18O(temp)
+    alfa_D = lbf.fractionation_factor_dD(temp)
+    ep_O = (alfa_O - 1)*1000
+    ep_D = (alfa_D - 1)*1000
+    return {'dX_S_O': lake_O, 'dX_S_D': lake_D,
+            'dX_A_O': lbf.isotope_atm(precip_O, ep_O, k), 'dX_A_D': lbf.isotope_atm(precip_D, ep_D, k),
+            'f_inlet': f_inlet, 'f_creek': f_creek, 'f_precip': f_precip, 'f_outlet': f_outlet,
+            'alfa_O': alfa_O, 'ep_eq_O': ep_O, 'alfa_D': alfa_D, 'ep_eq_D': ep_D}
+
+initial_guesses = [0, 231211349.583575, 0.435, 0.76, -16.2150279446561, -122.143792918018]
+
+#%% Solver helpers
+
+# Residuals scaled so that every equation is dimensionless (the two water balance equations are in m3/yr)
+
+def scaled_residual(roots, args):
+    res = lbf.hydro_balance(roots, *[args[name] for name in arg_names])
+    f_total = args['f_inlet'] + args['f_creek'] + args['f_precip']
+    return res/np.array([f_total, f_total, 1, 1, 1, 1])
+
+# Finite-difference Jacobian of the scaled residuals
+
+def jacobian(roots, args, rel_step=1e-7):
+    roots = np.asarray(roots, dtype=float)
+    f0 = scaled_residual(roots, args)
+    J = np.empty((len(roots), len(roots)))
+    for j in range(len(roots)):
+        step = rel_step*max(abs(roots[j]), 1.0)
+        r = roots.copy()
+        r[j] += step
+        J[:, j] = (scaled_residual(r, args) - f0)/step
+    return J
+
+# One warm-started solve. Returns (roots, converged, nfev, max scaled residual)
+
+def solve_point(guess, args, tol=1e-8):
+    roots, info, ier, msg = opt.fsolve(lbf.hydro_balance, guess, args=tuple(args[name] for name in arg_names),
+                                       full_output=True)
+    resid = np.max(np.abs(scaled_residual(roots, args)))
+    return roots, (ier == 1) and (resid < tol), info['nfev'], resid
+
+#%% Sweeps
+
+# Solve along a path of input values. path: list of dicts {input name: value} applied on top of base_args.
+# Each point is solved from a secant prediction through the previous two solutions (first point: guess).
+# Failed points are retried by bisecting the step from the last converged point, up to max_bisections times.
+
+def trace(path, base_args=None, guess=initial_guesses, tol=1e-8, max_bisections=4, jump_tol=0.05):
+    base_args = balance_args() if base_args is None else base_args
+    params = list(path[0])
+
+    rows = []
+    prev = [] # last two converged (parameter vector, roots)
+    det_sign = None
+
+    for point in path:
+        args = dict(base_args, **point)
+        p_vec = np.array([point[name] for name in params], dtype=float)
+
+        predicted = _predict(prev, p_vec, guess)
+        roots, ok, nfev, resid = solve_point(predicted, args, tol)
+
+        # Bisect the step from the last converged point
+        n_bisect = 0
+        while not ok and prev and n_bisect < max_bisections:
+            n_bisect += 1
+            p_last, r_last = prev[-1]
+            sub = [prev[-1]]
+            n_sub = 2**n_bisect
+            for s in range(1, n_sub + 1):
+                p_s = p_last + (p_vec - p_last)*s/n_sub
+                args_s = dict(base_args, **dict(zip(params, p_s)))
+                r_s, ok, n_s, resid = solve_point(_predict(sub, p_s, sub[-1][1]), args_s, tol)
+                nfev += n_s
+                if not ok:
+                    break
+                sub.append((p_s, r_s))
+            roots = sub[-1][1]
+
+        row = dict(point)
+        if ok:
+            J = jacobian(roots, args)
+            det = np.linalg.det(J)
+            fold = det_sign is not None and np.sign(det) != det_sign
+            det_sign = np.sign(det)
+            scale = np.maximum(np.abs(predicted), [args['f_inlet'], args['f_inlet'], 1, 1, 1, 1])
+            jump = bool(len(prev) == 2 and np.max(np.abs(roots - predicted)/scale) > jump_tol)
+            prev = (prev + [(p_vec, roots)])[-2:]
+        else:
+            roots = np.full(len(unknowns), np.nan)
+            det, fold, jump = np.nan, False, False
+
+        row.update(dict(zip(unknowns, roots)))
+        row.update({'converged': ok, 'nfev': nfev, 'bisections': n_bisect, 'max_residual': resid,
+                    'jac_det': det, 'fold': fold, 'jump': jump})
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+# Secant predictor through the last two converged points (zeroth order if only one is available)
+
+def _predict(prev, p_vec, guess):
+    if not prev:
+        return np.asarray(guess, dtype=float)
+    if len(prev) == 1:
+        return prev[-1][1]
+    (p0, r0), (p1, r1) = prev[-2], prev[-1]
+    dp = p1 - p0
+    denom = np.dot(dp, dp)
+    if denom == 0:
+        return r1
+    t = np.dot(p_vec - p1, dp)/denom
+    return r1 + t*(r1 - r0)
+
+# Sweep one input over a list of values
+
+def sweep(param, values, base_args=None, guess=initial_guesses, **kwargs):
+    return trace([{param: v} for v in values], base_args, guess, **kwargs)
+
+# Sweep two inputs over a grid. The grid is traversed in serpentine order so that every point is warm-started
+# from an adjacent grid point
+
+def sweep_2d(param1, values1, param2, values2, base_args=None, guess=initial_guesses, **kwargs):
+    path = []
+    for i, v1 in enumerate(values1):
+        row = values2 if i % 2 == 0 else values2[::-1]
+        path += [{param1: v1, param2: v2} for v2 in row]
+    out = trace(path, base_args, guess, **kwargs)
+    return out.sort_values([param1, param2]).reset_index(drop=True)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:40:29 2026
+
+@author: mcustado
+"""
+import os
+import numpy as np
+import pandas as pd
+
+########## Out-of-core filtering and statistics for large isotope databases #################
+
+# Regional dumps of isotope databases (Waterisotopes.org and project data, same columns as BL_master_list.csv) can have
+# millions of rows. Here they are read in chunks with the filters (bounding box, Type, Subgroup, date range) applied
+# to each chunk as it is read, and only the needed columns are parsed. A query is a plain dict describing the
+# source and filters; nothing is read until it is collected, extracted to a file or summarized. Statistics per site
+# or subgroup are merged chunk by chunk (counts, means and sums of squared deviations), so memory is bounded by the
+# chunk size and the number of groups.
+
+# Parquet sources (requires pyarrow) are scanned as a dataset, so the filters are also used to skip row groups.
+
+date_format = '%m/%d/%Y'
+date_column = 'Sample_Collection_Date'
+value_columns = ['d18O', 'dD', 'd_excess']
+
+#%% Queries
+
+# Lazy query. bbox: (min lon, min lat, max lon, max lat); types/subgroups: lists of accepted values;
+# start/end: dates (inclusive, anything pd.Timestamp accepts); columns: columns to return (None = all)
+
+def query(path, bbox=None, types=None, subgroups=None, start=None, end=None, columns=None, chunksize=500000):
+    return {'path': path, 'bbox': bbox, 'types': types, 'subgroups': subgroups,
+            'start': None if start is None else pd.Timestamp(start), 'end': None if end is None else pd.Timestamp(end),
+            'columns': columns, 'chunksize': chunksize}
+
+# Same query with more filters (e.g. narrow(q, subgroups=['Around']))
+
+def narrow(q, **filters):
+    out = dict(q)
+    out.update(query(q['path'], **{key: filters.get(key, q[key]) for key in
+                                   ('bbox', 'types', 'subgroups', 'start', 'end', 'columns', 'chunksize')}))
+    return out
+
+def _needed_columns(q, header, extra=()):
+    if q['columns'] is None and not extra:
+        return None
+    cols = list(q['columns']) if q['columns'] is not None else ([] if extra else list(header))
+    cols += list(extra)
+    if q['bbox'] is not None:
+        cols += ['Lat', 'Lon']
+    if q['types'] is not None:
+        cols.append('Type')
+    if q['subgroups'] is not None:
+        cols.append('Subgroup')
+    if q['start'] is not None or q['end'] is not None:
+        cols.append(date_column)
+    return [c for c in header if c in set(cols)]
+
+def _mask(q, chunk):
+    keep = np.ones(len(chunk), dtype=bool)
+    if q['bbox'] is not None:
+        x0, y0, x1, y1 = q['bbox']
+        keep &= chunk['Lon'].between(x0, x1).to_numpy() & chunk['Lat'].between(y0, y1).to_numpy()
+    if q['types'] is not None:
+        keep &= chunk['Type'].isin(q['types']).to_numpy()
+    if q['subgroups'] is not None:
+        keep &= chunk['Subgroup'].isin(q['subgroups']).to_numpy()
+    if q['start'] is not None or q['end'] is not None:
+        dates = pd.to_datetime(chunk[date_column], format=date_format, errors='coerce')
+        if q['start'] is not None:
+            keep &= (dates >= q['start']).to_numpy()
+        if q['end'] is not None:
+            keep &= (dates <= q['end']).to_numpy()
+    return keep
+
+def _parquet_filter(q):
+    import pyarrow.dataset as ds
+    expr = None
+    def both(a, b):
+        return b if a is None else a & b
+    if q['bbox'] is not None:
+        x0, y0, x1, y1 = q['bbox']
+        expr = both(expr, (ds.field('Lon') >= x0) & (ds.field('Lon') <= x1) &
+                          (ds.field('Lat') >= y0) & (ds.field('Lat') <= y1))
+    if q['types'] is not None:
+        expr = both(expr, ds.field('Type').isin(list(q['types'])))
+    if q['subgroups'] is not None:
+        expr = both(expr, ds.field('Subgroup').isin(list(q['subgroups'])))
+    return expr
+
+# Yield the filtered chunks of a query (extra: additional columns needed by the caller)
+
+def stream(q, extra=()):
+    path = q['path']
+    if path.endswith('.parquet'):
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(path, format='parquet')
+        cols = _needed_columns(q, dataset.schema.names, extra)
+        for batch in dataset.to_batches(columns=cols, filter=_parquet_filter(q), batch_size=q['chunksize']):
+            chunk = batch.to_pandas()
+            yield chunk[_mask(q, chunk)] if q['start'] is not None or q['end'] is not None else chunk
+    else:
+        header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+        cols = _needed_columns(q, header, extra)
+        for chunk in pd.read_csv(path, usecols=cols, chunksize=q['chunksize'], encoding='utf-8-sig'):
+            yield chunk[_mask(q, chunk)]
+
+# Filtered rows in memory (for results known to be small)
+
+def collect(q):
+    chunks = [c for c in stream(q) if len(c)]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+# Write the filtered rows to a CSV file chunk by chunk (e.g. the sample set of a new basin). Returns the row count
+
+def extract(q, out_path):
+    n = 0
+    if os.path.exists(out_path):
+        os.remove(out_path)
+    for chunk in stream(q):
+        chunk.to_csv(out_path, mode='a', header=not os.path.exists(out_path), index=False)
+        n += len(chunk)
+    return n
+
+#%% Grouped statistics
+
+# Per-group count, mean and sum of squared deviations of each value column in one chunk
+
+def _chunk_moments(chunk, by, values):
+    g = chunk.groupby(by, dropna=False)[values]
+    n = g.count()
+    mean = g.mean()
+    m2 = g.var(ddof=0)*n
+    return n, mean, m2.fillna(0)
+
+# Chan et al. merge of two sets of grouped moments
+
+def _merge(a, b):
+    if a is None:
+        return b
+    index = a[0].index.union(b[0].index)
+    na, ma, sa = [x.reindex(index).fillna(0) for x in a]
+    nb, mb, sb = [x.reindex(index).fillna(0) for x in b]
+    n = na + nb
+    delta = mb - ma
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (ma + delta*nb/n).where(n > 0, 0)
+        m2 = (sa + sb + delta**2*na*nb/n).where(n > 0, 0)
+    return n, mean, m2
+
+# Means, standard deviations (ddof=1) and counts of d18O, dD and d-excess per group.
+# by: column(s) to group by, e.g. 'Site_name', 'Subgroup' or ['Subgroup', 'Type'].
+# d-excess is computed as dD - 8*d18O where the d_excess column is missing or empty.
+# Returns a DataFrame with columns <value>_n, <value>_mean, <value>_sd per group
+
+def group_stats(q, by='Site_name', values=value_columns):
+    by = [by] if isinstance(by, str) else list(by)
+    extra = by + [v for v in ('d18O', 'dD') if 'd_excess' in values]
+    moments = None
+    for chunk in stream(q, extra=extra + list(values)):
+        if not len(chunk):
+            continue
+        if 'd_excess' in values:
+            dx = chunk['dD'] - 8*chunk['d18O']
+            chunk = chunk.assign(d_excess=chunk['d_excess'].fillna(dx) if 'd_excess' in chunk else dx)
+        moments = _merge(moments, _chunk_moments(chunk, by, list(values)))
+
+    if moments is None:
+        return pd.DataFrame()
+    n, mean, m2 = moments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sd = np.sqrt(m2/(n - 1)).where(n > 1)
+    out = pd.concat({'n': n.astype(int), 'mean': mean.where(n > 0), 'sd': sd}, axis=1)
+    out.columns = [v + '_' + stat for stat, v in out.columns]
+    return out[[v + '_' + stat for v in values for stat in ('n', 'mean', 'sd')]]
+
+def site_stats(q, values=value_columns):
+    return group_stats(q, ['Site_name', 'Subgroup'], values)
+
+def subgroup_stats(q, values=value_columns):
+    return group_stats(q, 'Subgroup', values)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:56 2026
+
+@author: mcustado
+"""
+import numpy as np
+import lake_balance_functions as lbf
+
+########## Analytic derivatives and first-order (delta method) uncertainty propagation #################
+
+# Closed-form partial derivatives of the functions in lake_balance_functions, chained to the five inputs
+# used in the uncertainty and sensitivity analyses (Section 5.3):
+    # hum = humidity
+    # temp = temperature (deg C)
+    # dX_P = evaporation flux-weighted precipitation
+    # dX_S = steady-state lake
+    # dX_I = total inflow
+# All functions accept scalars or arrays
+
+input_names = ['hum', 'temp', 'dX_P', 'dX_S', 'dX_I']
+
+#%% Partial derivatives of the individual functions
+
+# d(alpha)/d(temp) of the equilibrium fractionation factors
+
+def d_fractionation_factor_d18O(temp):
+    T = 273.15 + temp
+    dlna = (-6.7123/T**2) + (2*1666.4/T**3) - (3*350410/T**4)
+    return lbf.fractionation_factor_d18O(temp)*dlna
+
+def d_fractionation_factor_dD(temp):
+    T = 273.15 + temp
+    dlna = (3*1158.8*T**2/(10**12)) - (2*1620.1*T/(10**9)) + (794.84/(10**6)) - (3*2999200/T**4)
+    return lbf.fractionation_factor_dD(temp)*dlna
+
+# Derivatives of frac_factors: d(alfa)/d(temp), d(ep_eq)/d(temp) and d(ep_k)/d(humidity)
+
+def d_frac_factors(iso, temp):
+    if iso == 'd18O':
+        dalfa = d_fractionation_factor_d18O(temp)
+        dep_k = -14.2
+    else:
+        dalfa = d_fractionation_factor_dD(temp)
+        dep_k = -12.5
+    return dalfa, 1000*dalfa, dep_k
+
+# Partials of isotope_atm (precip, ep_eq, k)
+
+def d_isotope_atm(precip, ep_eq, k):
+    den = 1 + (0.001*k*ep_eq)
+    return {'precip': 1/den,
+            'ep_eq': -k*(1 + 0.001*precip)/den**2}
+
+# Partials of isotope_evap (h, ep_k, ep_eq, alfa, dX_A, dX_L)
+
+def d_isotope_evap(h, ep_k, ep_eq, alfa, dX_A, dX_L):
+    den = 1 - h + (0.001*ep_k)
+    dX_E = lbf.isotope_evap(h, ep_k, ep_eq, alfa, dX_A, dX_L)
+    return {'h': (-dX_A + dX_E)/den,
+            'ep_k': (-1 - 0.001*dX_E)/den,
+            'ep_eq': (-1/alfa)/den,
+            'alfa': (-(dX_L - ep_eq)/alfa**2)/den,
+            'dX_A': -h/den,
+            'dX_L': (1/alfa)/den}
+
+# Partials of E_I (h, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I)
+# X = M/Q, with M = (dX_S - dX_I)*(1 - h + 0.001*ep_k) and Q = h*(dX_A - dX_S) + (ep_k + ep_eq/alfa)*(1 + 0.001*dX_S)
+
+def d_E_I(h, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I):
+    D = 1 - h + (0.001*ep_k)
+    M = (dX_S - dX_I)*D
+    Q = h*(dX_A - dX_S) + (ep_k + (ep_eq/alfa))*(1 + 0.001*dX_S)
+    x_ = M/Q
+    return {'h': (-(dX_S - dX_I) - x_*(dX_A - dX_S))/Q,
+            'ep_k': (0.001*(dX_S - dX_I) - x_*(1 + 0.001*dX_S))/Q,
+            'ep_eq': (-x_*(1 + 0.001*dX_S)/alfa)/Q,
+            'alfa': (x_*(ep_eq/alfa**2)*(1 + 0.001*dX_S))/Q,
+            'dX_A': (-x_*h)/Q,
+            'dX_S': (D - x_*(0.001*(ep_k + (ep_eq/alfa)) - h))/Q,
+            'dX_I': -D/Q}
+
+#%% Gradients with respect to the model inputs
+
+# Returns (values, grads):
+    # values = {'dX_A': ..., 'dX_E': ..., 'X': ...}
+    # grads = {output: {input name: partial derivative}} for the inputs in input_names
+
+def gradients(iso, hum, temp, dX_P, dX_S, dX_I, k=1):
+    alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, hum)
+    dalfa, dep_eq, dep_k = d_frac_factors(iso, temp)
+
+    dX_A = lbf.isotope_atm(dX_P, ep_eq, k)
+    dX_E = lbf.isotope_evap(hum, ep_k, ep_eq, alfa, dX_A, dX_S)
+    x_ = lbf.E_I(hum, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I)
+
+    pa = d_isotope_atm(dX_P, ep_eq, k)
+    pe = d_isotope_evap(hum, ep_k, ep_eq, alfa, dX_A, dX_S)
+    px = d_E_I(hum, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I)
+
+    # Chain rule: temperature enters through alfa, ep_eq and dX_A; humidity through h and ep_k
+    dA_dtemp = pa['ep_eq']*dep_eq
+
+    grads = {'dX_A': {'hum': np.zeros_like(dX_A),
+                      'temp': dA_dtemp,
+                      'dX_P': pa['precip'],
+                      'dX_S': np.zeros_like(dX_A),
+                      'dX_I': np.zeros_like(dX_A)},
+             'dX_E': {'hum': pe['h'] + pe['ep_k']*dep_k,
+                      'temp': pe['alfa']*dalfa + pe['ep_eq']*dep_eq + pe['dX_A']*dA_dtemp,
+                      'dX_P': pe['dX_A']*pa['precip'],
+                      'dX_S': pe['dX_L'],
+                      'dX_I': np.zeros_like(dX_E)},
+             'X': {'hum': px['h'] + px['ep_k']*dep_k,
+                   'temp': px['alfa']*dalfa + px['ep_eq']*dep_eq + px['dX_A']*dA_dtemp,
+                   'dX_P': px['dX_A']*pa['precip'],
+                   'dX_S': px['dX_S'],
+                   'dX_I': px['dX_I']}}
+
+    return {'dX_A': dX_A, 'dX_E': dX_E, 'X': x_}, grads
+
+#%% First-order uncertainty propagation
+
+# Standard deviation of a uniform distribution of +/- half_width (the input distributions in the uncertainty script)
+
+def uniform_sd(half_width):
+    return np.abs(half_width)/np.sqrt(3)
+
+# Delta method: var(y) = sum_i (dy/dx_i * sd_i)^2 for independent inputs
+# sd: dict {input name: standard deviation}
+# Returns {output: {'value', 'sd', 'contribution' (fraction of variance per input)}}
+
+def propagate(values, grads, sd):
+    out = {}
+    for key, g in grads.items():
+        terms = {name: (g[name]*sd[name])**2 for name in input_names}
+        var = sum(terms.values())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            contribution = {name: terms[name]/var for name in input_names}
+        out[key] = {'value': values[key], 'sd': np.sqrt(var), 'contribution': contribution}
+    return out
+
+# Local sensitivity coefficients: raw partials and elasticities (relative change of output per relative change of input)
+
+def sensitivity_coefficients(values, grads, inputs):
+    out = {}
+    for key, g in grads.items():
+        out[key] = {name: {'partial': g[name],
+                           'elasticity': g[name]*inputs[name]/values[key]} for name in input_names}
+    return out
+
+# Convenience wrapper: uncertainty of dX_A, dX_E and X for uniform input uncertainties of +/- unc
+# (same inputs as custado_et_al_2024_uncertainty: iso_in = [k, dX_S, dX_I, dX_P], unc_in = [hum, temp, dX_P, dX_S, dX_I])
+
+def delta_method(iso, hum, temp, iso_in, unc_in):
+    k, dX_S, dX_I, dX_P = iso_in
+    values, grads = gradients(iso, hum, temp, dX_P, dX_S, dX_I, k)
+    sd = {name: uniform_sd(u) for name, u in zip(input_names, unc_in)}
+    return propagate(values, grads, sd)
+
+# Optional check of the delta method against a (vectorized) Monte Carlo run with the same uniform inputs
+
+def monte_carlo_check(iso, hum, temp, iso_in, unc_in, sim=100000, seed=None):
+    k, dX_S, dX_I, dX_P = iso_in
+    rng = np.random.default_rng(seed)
+    means = [hum, temp, dX_P, dX_S, dX_I]
+    draws = [rng.uniform(m - u, m + u, sim) for m, u in zip(means, unc_in)]
+
+    dX_A, dX_E, x_ = lbf.forward_model(iso, draws[0], draws[1], draws[2], draws[3], draws[4], k)
+    mc = {'dX_A': dX_A, 'dX_E': dX_E, 'X': x_}
+
+    linear = delta_method(iso, hum, temp, iso_in, unc_in)
+    check = {}
+    for key in mc:
+        check[key] = {'delta_mean': linear[key]['value'], 'delta_sd': linear[key]['sd'],
+                      'mc_mean': np.nanmean(mc[key]), 'mc_sd': np.nanstd(mc[key])}
+        check[key]['rel_diff_sd'] = (check[key]['delta_sd'] - check[key]['mc_sd'])/check[key]['mc_sd']
+    return check
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:24:21 2026
+
+@author: mcustado
+"""
+import os
+import re
+import numpy as np
+import pandas as pd
+
+########## Discharge record ingestion for the flux inputs of the mass balance #################
+
+# Reads local daily-discharge files for the gauges in stations_used.csv and aggregates them to annual or
+# evaporation-season volumes (m3), replacing the hand-typed fluxes in the mass balance and uncertainty scripts.
+# Files are read in chunks and reduced to one row per station and period as they stream in, so decades of daily
+# records for many gauges never sit in memory at once. Aggregates are kept in a small CSV store that is only
+# refreshed for files that changed since they were last ingested.
+
+# Supported formats:
+    # USGS RDB (tab-separated, '#' comment header, column names line, column format line),
+    #   daily mean discharge in the column ending in '_00060_00003' (cfs)
+    # CSV with a date column and a discharge column (names given by date_col and value_col)
+# Files are looked up in a data directory as <station id>.rdb, <station id>.txt or <station id>.csv
+
+# Conversion of discharge units to m3/day
+
+unit_factors = {'cfs': 0.028316846592*86400,
+                'cms': 86400,
+                'm3/day': 1}
+
+# Months of the evaporation season
+
+season_months = (5, 6, 7, 8, 9, 10)
+
+# Gauges contributing to each flux term of the hydrological balance (inlet canals, creeks and the outlet canal)
+
+default_roles = {'f_inlet': ['10046000', '10044300'],
+                 'f_creek': ['10054600', '10058600', '10060500',
+                             'UTAHDWQ_WQX-4907100', 'UTAHDWQ_WQX-4907120', 'UTAHDWQ_WQX-4907200'],
+                 'f_outlet': ['10059500']}
+
+store_columns = ['station', 'period_type', 'period', 'volume_m3', 'n_days', 'n_expected', 'signature']
+
+#%% Station list and file discovery
+
+# Station IDs from stations_used.csv (IDs in the file carry stray whitespace)
+
+def station_ids(path='stations_used.csv'):
+    stations = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    return [s.strip().replace('\xa0', '') for s in stations['Sample ID'].dropna()]
+
+def find_discharge_files(data_dir, ids):
+    files = {}
+    for sid in ids:
+        for ext in ('.rdb', '.txt', '.csv'):
+            path = os.path.join(data_dir, sid + ext)
+            if os.path.exists(path):
+                files[sid] = path
+                break
+    return files
+
+# Signature used to detect changed source files
+
+def file_signature(path):
+    st = os.stat(path)
+    return str(st.st_size) + '-' + str(int(st.st_mtime))
+
+#%% Streaming readers
+
+# Yield chunks of (date, daily volume in m3) from one file
+
+def read_discharge(path, chunksize=100000, units=None, date_col='date', value_col='discharge'):
+    if path.endswith('.csv'):
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=[date_col, value_col], dtype=str)
+        factor = unit_factors[units or 'cms']
+        for chunk in reader:
+            yield _to_volume(chunk[date_col], chunk[value_col], factor)
+        return
+
+    # USGS RDB
+    reader = pd.read_csv(path, sep='\t', comment='#', chunksize=chunksize, dtype=str)
+    factor = unit_factors[units or 'cfs']
+    q_col = None
+    for i, chunk in enumerate(reader):
+        if i == 0:
+            # First row below the column names is the column format line (e.g. 5s, 15s, 20d, 14n)
+            if len(chunk) and all(re.fullmatch(r'\d+[sdn]', str(v)) for v in chunk.iloc[0]):
+                chunk = chunk.iloc[1:]
+            q_col = [c for c in chunk.columns if c.endswith('_00060_00003')]
+            if not q_col:
+                raise ValueError("No daily mean discharge column (_00060_00003) in " + path)
+            q_col = q_col[0]
+        yield _to_volume(chunk['datetime'], chunk[q_col], factor)
+
+def _to_volume(dates, values, factor):
+    out = pd.DataFrame({'date': pd.to_datetime(dates, errors='coerce'),
+                        'volume': pd.to_numeric(values, errors='coerce')*factor})
+    return out.dropna()
+
+#%% Aggregation
+
+# Reduce a stream of daily volumes to one row per period, for every period type in a single pass over the file.
+# period_types: 'year' (calendar year), 'water_year' (Oct-Sep, labelled by the ending year) and/or 'season' (months)
+# Volumes are sums of the available days; n_expected is the number of days in the period, so gaps can be
+# checked and scaled (volume_m3*n_expected/n_days) where needed
+
+def aggregate_stream(chunks, period_types=('year',), months=season_months):
+    parts = {period_type: [] for period_type in period_types}
+    for chunk in chunks:
+        year = chunk['date'].dt.year
+        month = chunk['date'].dt.month
+        for period_type in period_types:
+            if period_type == 'season':
+                sel = month.isin(months)
+                key = year[sel]
+            elif period_type == 'water_year':
+                sel = slice(None)
+                key = year + (month >= 10)
+            else:
+                sel = slice(None)
+                key = year
+            parts[period_type].append(chunk['volume'][sel].groupby(key.values).agg(['sum', 'count']))
+
+    out = []
+    for period_type, p in parts.items():
+        if not p:
+            continue
+        agg = pd.concat(p).groupby(level=0).sum()
+        periods = agg.index.values.astype(int)
+        out.append(pd.DataFrame({'period_type': period_type,
+                                 'period': periods,
+                                 'volume_m3': agg['sum'].values,
+                                 'n_days': agg['count'].values.astype(int),
+                                 'n_expected': [_expected_days(y, period_type, months) for y in periods]}))
+
+    if not out:
+        return pd.DataFrame(columns=['period_type', 'period', 'volume_m3', 'n_days', 'n_expected'])
+    return pd.concat(out, ignore_index=True)
+
+def _expected_days(year, period_type, months):
+    if period_type == 'season':
+        return sum(pd.Period(year=year, month=m, freq='M').days_in_month for m in months)
+    if period_type == 'water_year':
+        return (pd.Timestamp(year, 10, 1) - pd.Timestamp(year - 1, 10, 1)).days
+    return 366 if pd.Timestamp(year, 12, 31).dayofyear == 366 else 365
+
+#%% Cached store
+
+# Load the store (empty if it does not exist yet)
+
+def load_store(store_path):
+    if os.path.exists(store_path):
+        return pd.read_csv(store_path, dtype={'station': str, 'signature': str})
+    return pd.DataFrame(columns=store_columns)
+
+# Ingest every station file in data_dir whose signature changed since the last update and save the store.
+# Returns the updated store
+
+def update_store(store_path, data_dir, ids=None, period_types=('year', 'season'), chunksize=100000, **read_kwargs):
+    ids = station_ids() if ids is None else ids
+    store = load_store(store_path)
+
+    for sid, path in find_discharge_files(data_dir, ids).items():
+        sig = file_signature(path)
+        current = store[store['station'] == sid]
+        if len(current) and (current['signature'] == sig).all() and set(period_types) <= set(current['period_type']):
+            continue
+
+        agg = aggregate_stream(read_discharge(path, chunksize, **read_kwargs), period_types)
+        agg.insert(0, 'station', sid)
+        agg['signature'] = sig
+        store = pd.concat([store[store['station'] != sid], agg], ignore_index=True)
+
+    store = store[store_columns].sort_values(['station', 'period_type', 'period']).reset_index(drop=True)
+    store.to_csv(store_path, index=False)
+    return store
+
+#%% Fluxes for the mass balance
+
+# Flux terms (m3) from the store: the sum over the gauges of each role, for one period or averaged over periods.
+# min_coverage: minimum fraction of days with data for a station-period to be used; shorter records are scaled up
+# to the full period. Returns {'f_inlet': ..., 'f_creek': ..., 'f_outlet': ...}
+
+def gauge_fluxes(store, roles=default_roles, period=None, period_type='year', min_coverage=0.9):
+    s = store[store['period_type'] == period_type].copy()
+    s = s[s['n_days']/s['n_expected'] >= min_coverage]
+    s['volume_full'] = s['volume_m3']*s['n_expected']/s['n_days']
+
+    if period is not None:
+        s = s[s['period'].isin(np.atleast_1d(period))]
+
+    per_station = s.groupby('station')['volume_full'].mean()
+
+    fluxes = {}
+    for role, ids in roles.items():
+        missing = [sid for sid in ids if sid not in per_station.index]
+        if missing:
+            raise ValueError("No usable discharge data for " + role + " gauges: " + ", ".join(missing))
+        fluxes[role] = per_station[ids].sum()
+    return fluxes
+
+# Total annual volumetric inflow used to convert X to an evaporation rate (custado_et_al_2024_uncertainty)
+
+def total_inflow(fluxes, f_precip, f_gwater=0):
+    return fluxes['f_inlet'] + fluxes['f_creek'] + f_precip + f_gwater
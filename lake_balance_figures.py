@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:28:50 2026
+
+@author: mcustado
+"""
+import os
+import json
+import hashlib
+import inspect
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+########## Headless, parallel build of the publication figures #################
+
+# Renders each figure of custado_et_al_2024_plots in its own worker process with the non-interactive Agg backend
+# and writes it to an output folder in the requested formats. A manifest in the output folder stores a hash of each
+# figure's inputs (the figure code, the plotting and mass balance modules, and the size/modification time of the
+# input files); figures whose hash and output files are unchanged are skipped.
+
+manifest_name = 'figures_manifest.json'
+
+#%% Input hashes
+
+def _file_stamp(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, int(st.st_mtime)]
+
+def input_hash(name, paths=None):
+    import custado_et_al_2024_plots as plots
+    import lake_balance_functions as lbf
+    import lake_balance_layers as lbl
+    import lake_balance_trajectories as lbt
+
+    paths = plots.paths if paths is None else paths
+    parts = {'figure': inspect.getsource(plots.figures[name]),
+             'modules': [inspect.getsource(m) for m in (plots, lbf, lbl, lbt)],
+             'files': [_file_stamp(paths[key]) for key in plots.figure_inputs[name]]}
+    text = json.dumps(parts, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _output_files(name, out_dir, formats):
+    return [os.path.join(out_dir, name + '.' + fmt) for fmt in formats]
+
+#%% Worker
+
+def _render(name, out_dir, formats, dpi, paths):
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import custado_et_al_2024_plots as plots
+
+    try:
+        fig = plots.figures[name](plots.paths if paths is None else paths)
+        files = _output_files(name, out_dir, formats)
+        for f in files:
+            fig.savefig(f, bbox_inches='tight', dpi=dpi)
+        plt.close('all')
+        return name, files, None
+    except Exception:
+        plt.close('all')
+        return name, [], traceback.format_exc()
+
+#%% Build
+
+# Render figures in parallel. names: figures to build (default: all in custado_et_al_2024_plots.figures)
+# force: re-render even if inputs are unchanged. Returns {figure name: 'built', 'skipped' or the error traceback}
+
+def build_figures(out_dir='figures', names=None, formats=('png', 'pdf'), dpi=600, workers=None, force=False,
+                  paths=None):
+    import custado_et_al_2024_plots as plots
+
+    names = list(plots.figures) if names is None else list(names)
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest_path = os.path.join(out_dir, manifest_name)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    hashes = {name: input_hash(name, paths) for name in names}
+    todo = [name for name in names
+            if force or manifest.get(name) != hashes[name]
+            or not all(os.path.exists(f) for f in _output_files(name, out_dir, formats))]
+
+    status = {name: 'skipped' for name in names if name not in todo}
+    if todo:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers or min(len(todo), os.cpu_count()), mp_context=ctx) as pool:
+            jobs = [pool.submit(_render, name, out_dir, tuple(formats), dpi, paths) for name in todo]
+            for job in jobs:
+                name, files, error = job.result()
+                if error is None:
+                    manifest[name] = hashes[name]
+                    status[name] = 'built'
+                else:
+                    manifest.pop(name, None)
+                    status[name] = error
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    return status
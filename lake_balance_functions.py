@@ -5,6 +5,7 @@ Created on Mon Jan  8 21:04:54 2024
 @author: mcustado
 """
 import lake_balance_functions as lbf
+import lake_balance_results as lbr
 
 import numpy as np
 
@@ -79,17 +80,28 @@ def mass_balance_ssx (h, ep_k, ep_eq, alfa, dX_A, dX_I, x):
 
 ### Construct hydrological balance by simultaneously calculating for evaporation, groundwater discharge, X, humidity, and isotpic composition of inflow
 
+# Isotopic composition of each inflow end-member (per mil), used by hydro_balance and the calibration in lake_balance_mcmc
+
+end_members = {'dX_inlet_O': -16.5680552351257,
+               'dX_creek_O': -16.6427693908244,
+               'dX_precip_O': -14.5993690452293,
+               'dX_gwater_O': -17.7983116883116,
+               'dX_inlet_D': -125.869415352418,
+               'dX_creek_D': -126.203603690239,
+               'dX_precip_D': -105.704124214273,
+               'dX_gwater_D': -135.735649350649}
+
 def hydro_balance(vars, dX_S_O, dX_S_D, dX_A_O, dX_A_D, f_inlet, f_creek, f_precip, f_outlet, alfa_O, ep_eq_O, alfa_D, ep_eq_D):
     
     # define constants
-    dX_inlet_O = -16.5680552351257
-    dX_creek_O = -16.6427693908244
-    dX_precip_O = -14.5993690452293
-    dX_gwater_O = -17.7983116883116
-    dX_inlet_D = -125.869415352418
-    dX_creek_D = -126.203603690239
-    dX_precip_D = -105.704124214273
-    dX_gwater_D = -135.735649350649
+    dX_inlet_O = end_members['dX_inlet_O']
+    dX_creek_O = end_members['dX_creek_O']
+    dX_precip_O = end_members['dX_precip_O']
+    dX_gwater_O = end_members['dX_gwater_O']
+    dX_inlet_D = end_members['dX_inlet_D']
+    dX_creek_D = end_members['dX_creek_D']
+    dX_precip_D = end_members['dX_precip_D']
+    dX_gwater_D = end_members['dX_gwater_D']
 
     # define unknowns
     
@@ -144,6 +156,28 @@ def kinetic_en_dD(humidity):
     ep_k = 12.5*(1-humidity)
     return ep_k
 
+# Fractionation and enrichment factors for either isotope ('d18O' or 'dD'). Inputs can be scalars or arrays
+
+def frac_factors(iso, temp, humidity):
+    if iso == 'd18O':
+        alfa = fractionation_factor_d18O(temp)
+        ep_k = kinetic_en_d18O(humidity)
+    else:
+        alfa = fractionation_factor_dD(temp)
+        ep_k = kinetic_en_dD(humidity)
+    ep_eq = (alfa - 1)*1000
+    return alfa, ep_eq, ep_k # Returns fractionation factor, equilibrium and kinetic enrichment factors
+
+# Chain used in the uncertainty and sensitivity analyses: climate and isotope inputs -> dX_A, dX_E and X.
+# Inputs can be scalars or arrays of the same shape, so a whole ensemble is evaluated in one call
+
+def forward_model(iso, h, temp, dX_P, dX_S, dX_I, k=1):
+    alfa, ep_eq, ep_k = frac_factors(iso, temp, h)
+    dX_A = isotope_atm(dX_P, ep_eq, k)
+    dX_E = isotope_evap(h, ep_k, ep_eq, alfa, dX_A, dX_S)
+    x_ = E_I(h, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I)
+    return dX_A, dX_E, x_ # Returns isotope of atmosphere, evaporate and X
+
 #%% Print data functions
 
 # Data for first mass balance calculations
@@ -165,45 +199,17 @@ def print_results_calcs1(iso, hum, temp, ep, ep_k, alpha, ds, dX_A, dX_E, xs):
            "\nX:\t",xs)
     
 # Data for uncertainty calculations
+# Prints the summary of each output distribution and returns it as records (see lake_balance_results)
 
-def print_results_unc(iso, sim, x_dist, dX_E_dist, dX_A_dist, E_dist):
+def print_results_unc(iso, sim, x_dist, dX_E_dist, dX_A_dist, E_dist, period=None):
         
     print("Isotope:\t",iso,
         "\nNumber of simulations:\t", sim)
     
-    print("\nX output:",
-        "\nmean output:\t", np.nanmean(x_dist),
-        "\nmedian output:\t", np.median(x_dist),
-        "\nstdev output:\t", np.nanstd(x_dist),
-        "\n15.9 perc output:\t", np.percentile(x_dist, 15.9),
-        "\n84.1 perc output:\t", np.percentile(x_dist, 84.1),
-        "\nminimum output:\t", np.min(x_dist),
-        "\nmaximum output:\t", np.max(x_dist))
-    
-    print("\ndX_E output:",
-        "\nmean output:\t", np.nanmean(dX_E_dist),
-        "\nmedian output:\t", np.median(dX_E_dist),
-        "\nstd output:\t", np.nanstd(dX_E_dist),
-        "\n15.9 perc output:\t", np.percentile(dX_E_dist, 15.9),
-        "\n84.1 perc output:\t", np.percentile(dX_E_dist, 84.1),
-        "\nminimum output:\t", np.min(dX_E_dist),
-        "\nmaximum output:\t", np.max(dX_E_dist))
-        
-    print("\ndX_A output:",
-        "\nmean output:\t", np.nanmean(dX_A_dist),
-        "\nmedian output:\t", np.median(dX_A_dist),
-        "\nstd output:\t", np.nanstd(dX_A_dist),
-        "\n15.9 perc output:\t", np.percentile(dX_A_dist, 15.9),
-        "\n84.1 perc output:\t", np.percentile(dX_A_dist, 84.1),
-        "\nminimum output:\t", np.min(dX_A_dist),
-        "\nmaximum output:\t", np.max(dX_A_dist))
+    labels = {'iso': iso} if period is None else {'iso': iso, 'period': period}
+    records = lbr.summarize({'X': x_dist, 'dX_E': dX_E_dist, 'dX_A': dX_A_dist, 'E': E_dist}, **labels)
+    for rec in records:
+        lbr.print_record(rec)
     
-    print("\nE output:",
-        "\nmean output:\t", np.nanmean(E_dist),
-        "\nmedian output:\t", np.median(E_dist),
-        "\nstd output:\t", np.nanstd(E_dist),
-        "\n15.9 perc output:\t", np.percentile(E_dist, 15.9),
-        "\n84.1 perc output:\t", np.percentile(E_dist, 84.1),
-        "\nminimum output:\t", np.min(E_dist),
-        "\nmaximum output:\t", np.max(E_dist))
+    return records
     
\ No newline at end of file
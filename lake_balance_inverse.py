@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:39:01 2026
+
+@author: mcustado
+"""
+import numpy as np
+import lake_balance_functions as lbf
+import lake_balance_derivatives as lbd
+import lake_balance_montecarlo as lbm
+
+########## Inverse solutions: humidity (or temperature) from X and lake isotopes #################
+
+# The scenario script runs the model forward (assumed humidity/temperature -> X). Here the steady-state equation
+# X = E_I(hum, temp, dX_P, dX_S, dX_I) is solved for humidity (or temperature) given X and the isotope inputs, for
+# whole ensembles at once: every member keeps its own bracket, and each iteration takes a Newton step (slope from
+# lake_balance_derivatives) where it stays inside the bracket and a bisection step otherwise, so each member
+# converges at least as fast as bisection. Members are solved together with array operations; converged members
+# are left untouched.
+
+# Humidity has an exact solution: E_I = M/Q with M = (dX_S - dX_I)*(1 - h + 0.001*ep_k) and
+# Q = h*(dX_A - dX_S) + (ep_k + ep_eq/alfa)*(1 + 0.001*dX_S), where ep_k = c*(1 - h) and alfa, ep_eq and dX_A do not
+# depend on h, so M - X*Q = 0 is linear in h. solve_humidity uses it; the iterative solver is used for temperature
+# (and can be used for humidity as a check, with the bracket cut just below the pole of E_I, where Q = 0).
+
+# Status codes returned per member:
+    # 0: converged
+    # 1: no solution in the bracket (X - E_I has the same sign at both ends)
+    # 2: not converged within max_iter
+    # 3: sign change without a root (a pole of E_I inside the bracket; residual not small)
+    # 4: non-finite inputs
+
+status_names = {0: 'converged', 1: 'no_bracket', 2: 'max_iter', 3: 'pole', 4: 'invalid'}
+
+default_bracket = {'hum': (0.0, 0.99), 'temp': (-20.0, 40.0)}
+
+#%% Solver
+
+def _denominator(iso, hum, temp, dX_P, dX_S, k):
+    alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, hum)
+    dX_A = lbf.isotope_atm(dX_P, ep_eq, k)
+    return hum*(dX_A - dX_S) + (ep_k + ep_eq/alfa)*(1 + 0.001*dX_S)
+
+# Humidity at which E_I has its pole (NaN if Q does not change sign between lo and hi)
+
+def pole_humidity(iso, temp, dX_P, dX_S, k=1, lo=0.0, hi=1.0):
+    q_lo = _denominator(iso, lo, temp, dX_P, dX_S, k)
+    q_hi = _denominator(iso, hi, temp, dX_P, dX_S, k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = lo - q_lo*(hi - lo)/(q_hi - q_lo)
+    return np.where((h > lo) & (h < hi), h, np.nan)
+
+def _residual(var, value, X, args):
+    a = dict(args)
+    a[var] = value
+    values, grads = lbd.gradients(a['iso'], a['hum'], a['temp'], a['dX_P'], a['dX_S'], a['dX_I'], a['k'])
+    return values['X'] - X, grads['X'][var]
+
+# Solve E_I(...) = X for var ('hum' or 'temp'); the other inputs are fixed at the given values.
+# All inputs broadcast together (e.g. X of shape (n, 1) and temp of shape (1, m) give an n x m array).
+# Returns dict with the solution (NaN where not solved), status, iterations and final residual
+
+def solve(var, X, iso='d18O', hum=None, temp=None, dX_P=None, dX_S=None, dX_I=None, k=1, bracket=None,
+          tol=1e-10, ftol=1e-6, max_iter=100):
+    lo_b, hi_b = default_bracket[var] if bracket is None else bracket
+    fixed = {'hum': hum, 'temp': temp, 'dX_P': dX_P, 'dX_S': dX_S, 'dX_I': dX_I, 'k': k}
+    fixed[var] = lo_b
+    arrays = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in
+                                   (X, fixed['hum'], fixed['temp'], dX_P, dX_S, dX_I, k, lo_b, hi_b)])
+    X, h_, t_, p_, s_, i_, k_, lo, hi = [np.array(a) for a in arrays]
+    shape = X.shape
+    args = {'iso': iso, 'hum': h_.ravel(), 'temp': t_.ravel(), 'dX_P': p_.ravel(), 'dX_S': s_.ravel(),
+            'dX_I': i_.ravel(), 'k': k_.ravel()}
+    X, lo, hi = X.ravel(), lo.ravel(), hi.ravel()
+    n = X.size
+
+    status = np.full(n, 2)
+    iterations = np.zeros(n, dtype=int)
+    root = np.full(n, np.nan)
+    resid = np.full(n, np.nan)
+
+    if var == 'hum':
+        pole = pole_humidity(iso, args['temp'], args['dX_P'], args['dX_S'], args['k'], lo, hi)
+        hi = np.where(np.isfinite(pole), pole - 1e-9, hi)
+
+    valid = np.isfinite(X) & np.all([np.isfinite(args[name]) | (name == var) for name in lbd.input_names], axis=0)
+    status[~valid] = 4
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        f_lo, _ = _residual(var, lo, X, args)
+        f_hi, _ = _residual(var, hi, X, args)
+        bracketed = valid & (np.sign(f_lo) != np.sign(f_hi))
+        status[valid & ~bracketed] = 1
+
+        # Ends that are already roots
+        for end, f_end in ((lo, f_lo), (hi, f_hi)):
+            hit = valid & (f_end == 0)
+            root[hit], resid[hit], status[hit] = end[hit], 0.0, 0
+
+        active = np.flatnonzero(bracketed & (status == 2))
+        a_lo, a_hi, a_flo = lo[active], hi[active], f_lo[active]
+        x = 0.5*(a_lo + a_hi)
+        sub = {name: (v[active] if isinstance(v, np.ndarray) else v) for name, v in args.items()}
+
+        for it in range(1, max_iter + 1):
+            f, df = _residual(var, x, X[active], sub)
+
+            # Shrink the bracket around the root
+            same = np.sign(f) == np.sign(a_flo)
+            a_lo = np.where(same, x, a_lo)
+            a_flo = np.where(same, f, a_flo)
+            a_hi = np.where(same, a_hi, x)
+
+            # Newton step if it stays inside the bracket, bisection otherwise
+            newton = x - f/df
+            inside = np.isfinite(newton) & (newton > a_lo) & (newton < a_hi)
+            x_new = np.where(inside, newton, 0.5*(a_lo + a_hi))
+
+            done = (np.abs(x_new - x) <= tol*(1 + np.abs(x))) | (f == 0) | (a_hi - a_lo <= tol)
+            iterations[active] = it
+            if done.any():
+                idx = active[done]
+                root[idx] = np.where(f[done] == 0, x[done], x_new[done])
+                status[idx] = 0
+                keep = ~done
+                active = active[keep]
+                a_lo, a_hi, a_flo, x_new = a_lo[keep], a_hi[keep], a_flo[keep], x_new[keep]
+                sub = {name: (v[keep] if isinstance(v, np.ndarray) else v) for name, v in sub.items()}
+            x = x_new
+            if active.size == 0:
+                break
+
+        # Converged members must also satisfy the equation (a sign change across a pole does not)
+        solved = np.flatnonzero(status == 0)
+        f, _ = _residual(var, root[solved], X[solved], {name: (v[solved] if isinstance(v, np.ndarray) else v)
+                                                       for name, v in args.items()})
+        resid[solved] = f
+        pole = np.abs(f) > ftol*np.maximum(1, np.abs(X[solved]))
+        status[solved[pole]] = 3
+        root[solved[pole]] = np.nan
+
+    return {var: root.reshape(shape), 'status': status.reshape(shape), 'iterations': iterations.reshape(shape),
+            'residual': resid.reshape(shape)}
+
+#%% Convenience wrappers
+
+# Humidity consistent with X for given temperature and isotope inputs (exact, see above).
+# Returns dict with hum (NaN where not solved), status (0 converged, 1 outside the bracket or no positive-Q
+# solution, 4 invalid inputs) and residual
+
+def solve_humidity(X, temp, dX_P, dX_S, dX_I, iso='d18O', k=1, bracket=default_bracket['hum']):
+    X, temp, dX_P, dX_S, dX_I, k = np.broadcast_arrays(*[np.asarray(v, dtype=float)
+                                                        for v in (X, temp, dX_P, dX_S, dX_I, k)])
+    alfa, ep_eq, c = lbf.frac_factors(iso, temp, 0) # c: kinetic enrichment at h = 0
+    dX_A = lbf.isotope_atm(dX_P, ep_eq, k)
+
+    # M = m*(1 - h), Q = q0 + q1*h
+    m = (dX_S - dX_I)*(1 + 0.001*c)
+    q0 = (c + ep_eq/alfa)*(1 + 0.001*dX_S)
+    q1 = (dX_A - dX_S) - c*(1 + 0.001*dX_S)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = (m - X*q0)/(m + X*q1)
+
+    valid = np.isfinite(X) & np.isfinite(temp) & np.isfinite(dX_P) & np.isfinite(dX_S) & np.isfinite(dX_I)
+    ok = valid & np.isfinite(h) & (h >= bracket[0]) & (h <= bracket[1]) & (q0 + q1*h > 0)
+    status = np.where(ok, 0, np.where(valid, 1, 4))
+    h = np.where(ok, h, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        _, _, x_ = lbf.forward_model(iso, h, temp, dX_P, dX_S, dX_I, k)
+    return {'hum': h, 'status': status, 'residual': x_ - X}
+
+# Temperature consistent with X for given humidity and isotope inputs
+
+def solve_temperature(X, hum, dX_P, dX_S, dX_I, iso='d18O', k=1, **kwargs):
+    return solve('temp', X, iso, hum=hum, dX_P=dX_P, dX_S=dX_S, dX_I=dX_I, k=k, **kwargs)
+
+# Humidity-temperature curve: humidity for each temperature in temps (and each X in X, as rows)
+
+def humidity_temperature_curve(X, temps, dX_P, dX_S, dX_I, iso='d18O', k=1, **kwargs):
+    X = np.atleast_1d(np.asarray(X, dtype=float))[:, None]
+    temps = np.asarray(temps, dtype=float)[None, :]
+    out = solve_humidity(X, temps, dX_P, dX_S, dX_I, iso, k, **kwargs)
+    out['temp'] = np.broadcast_to(temps, out['hum'].shape)
+    return out
+
+# Humidity ensemble for a prior X range and uncertain inputs.
+# inputs: lake_balance_montecarlo input specification for X, temp, dX_P, dX_S, dX_I
+#   (e.g. {'X': ('uniform', 0.3, 0.5), 'temp': ('normal', 5.15, 0.3), 'dX_S': ('uniform', -14.03, -12.23), ...})
+# Returns the solve output plus the drawn inputs
+
+def humidity_ensemble(iso, inputs, n, k=1, seed=None, **kwargs):
+    rng = np.random.default_rng(seed)
+    draws = {name: lbm.draw(rng, inputs[name], n) for name in ('X', 'temp', 'dX_P', 'dX_S', 'dX_I')}
+    out = solve_humidity(draws['X'], draws['temp'], draws['dX_P'], draws['dX_S'], draws['dX_I'], iso, k, **kwargs)
+    out['inputs'] = draws
+    return out
+
+def status_counts(status):
+    return {status_names[code]: int(np.sum(status == code)) for code in status_names}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:27:27 2026
+
+@author: mcustado
+"""
+import os
+import json
+import hashlib
+import geopandas as gp
+import pyogrio
+import shapely
+
+########## Pre-clipped, simplified map layers for Figure 1 #################
+
+# Reading the full North American rivers shapefile and reprojecting it on every run is the slow part of Figure 1.
+# prepare_layer reads only the features inside the map window, filters them by attribute, reprojects, clips and
+# simplifies them once, and caches the result as GeoParquet. The cache file name is a hash of the source file
+# (path, size, modification time) and of the preparation settings, so a changed source or window produces a new
+# layer and unchanged ones load in well under a second.
+
+cache_dir = 'layer_cache'
+
+# Figure 1 map window (lon/lat): x from -112.5 to -110.5, y from 40.5 to 43
+
+figure1_bbox = (-112.5, 40.5, -110.5, 43)
+
+# Points per window edge used to find the window's extent in the source crs
+
+densify = 100
+
+#%% Cache keys
+
+def cache_key(path, **settings):
+    st = os.stat(path)
+    source = {'path': os.path.abspath(path), 'size': st.st_size, 'mtime': int(st.st_mtime)}
+    text = json.dumps({'source': source, 'settings': settings}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def cache_path(path, key, cache_dir=cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, stem + '_' + key + '.parquet')
+
+#%% Layer preparation
+
+# Prepare one layer for a map window.
+# bbox: (minx, miny, maxx, maxy) in the output crs
+# column with contains (substring) or equals (exact value): attribute filter, e.g. column='NAMEEN', contains='Bear'
+# simplify: simplification tolerance in output crs units (None to keep full detail)
+# Returns the prepared GeoDataFrame (read from the cache when available)
+
+def prepare_layer(path, bbox=figure1_bbox, crs='EPSG:4326', column=None, contains=None, equals=None,
+                  simplify=None, cache_dir=cache_dir, refresh=False):
+    key = cache_key(path, bbox=list(bbox), crs=crs, column=column, contains=contains, equals=equals,
+                    simplify=simplify)
+    out = cache_path(path, key, cache_dir)
+    if os.path.exists(out) and not refresh:
+        return gp.read_parquet(out)
+
+    window = gp.GeoSeries([shapely.box(*bbox)], crs=crs)
+
+    # Only read features intersecting the window (window expressed in the source crs). The window edges are densified
+    # first: after reprojection they are curves that can bulge past the reprojected corners
+    src_crs = pyogrio.read_info(path)['crs'] # header only
+    step = max(bbox[2] - bbox[0], bbox[3] - bbox[1])/densify
+    read_window = window.segmentize(step).to_crs(src_crs) if src_crs is not None else window
+    layer = gp.read_file(path, bbox=tuple(read_window.total_bounds))
+
+    if column is not None:
+        if contains is not None:
+            layer = layer[layer[column].str.contains(contains, na=False)]
+        if equals is not None:
+            layer = layer[layer[column] == equals]
+
+    if layer.crs is not None:
+        layer = layer.to_crs(crs)
+    layer = gp.clip(layer, window.iloc[0])
+
+    if simplify:
+        layer = layer.set_geometry(layer.geometry.simplify(simplify, preserve_topology=True))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    layer.to_parquet(out)
+    return layer
+
+# Remove cached layers that no longer match any current source/settings (keep: list of paths returned by cache_path)
+
+def prune_cache(keep, cache_dir=cache_dir):
+    keep = {os.path.abspath(p) for p in keep}
+    for name in os.listdir(cache_dir):
+        path = os.path.abspath(os.path.join(cache_dir, name))
+        if name.endswith('.parquet') and path not in keep:
+            os.remove(path)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:34:51 2026
+
+@author: mcustado
+"""
+import numpy as np
+import pandas as pd
+
+########## Local evaporation lines (LEL) from the master list #################
+
+# Fits dD = slope*d18O + intercept to groups of samples (by subgroup or site) with ordinary least squares or York
+# regression (errors in both variables, from the d18O_SD and dD_SD columns; York et al., 2004), bootstraps the fit
+# and intersects the LEL with the global meteoric water line (GMWL, dD = 8*d18O + 10).
+
+# All fits work on the last axis of their inputs, so the B bootstrap resamples of a group are drawn as one (B, n)
+# index array and fitted in a single vectorized call.
+
+gmwl_slope = 8
+gmwl_intercept = 10
+
+# Analytical uncertainties used where d18O_SD/dD_SD are missing, and lower bound for the reported ones
+# (a few rows report 0, which would give a sample an infinite weight in the York fit)
+
+default_sd = {'d18O': 0.1, 'dD': 1.0}
+min_sd = {'d18O': 0.01, 'dD': 0.1}
+
+#%% Regressions (vectorized over leading axes)
+
+def ols(x, y):
+    xm = x.mean(axis=-1, keepdims=True)
+    ym = y.mean(axis=-1, keepdims=True)
+    sxx = ((x - xm)**2).sum(axis=-1)
+    sxy = ((x - xm)*(y - ym)).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy/sxx
+    intercept = ym[..., 0] - slope*xm[..., 0]
+    return slope, intercept
+
+# York regression; r: correlation of the d18O and dD errors (0 by default). b0: starting slope (default: OLS slope)
+# Returns slope, intercept and their standard errors
+
+def york(x, y, sx, sy, r=0, b0=None, tol=1e-10, max_iter=100):
+    sx2 = sx**2
+    sy2 = sy**2
+    b = ols(x, y)[0] if b0 is None else np.broadcast_to(b0, x.shape[:-1])
+    b = b[..., None]
+
+    for _ in range(max_iter):
+        W = 1/(sy2 + b**2*sx2 - 2*b*r*sx*sy) if r else 1/(sy2 + b**2*sx2)
+        sw = W.sum(axis=-1, keepdims=True)
+        Xbar = (W*x).sum(axis=-1, keepdims=True)/sw
+        Ybar = (W*y).sum(axis=-1, keepdims=True)/sw
+        U = x - Xbar
+        V = y - Ybar
+        beta = U*sy2 + b*V*sx2
+        if r:
+            beta -= (b*U + V)*r*sx*sy
+        Wb = W*W*beta
+        with np.errstate(divide='ignore', invalid='ignore'):
+            b_new = (Wb*V).sum(axis=-1, keepdims=True)/(Wb*U).sum(axis=-1, keepdims=True)
+        done = np.all((np.abs(b_new - b) <= tol*np.abs(b_new)) | ~np.isfinite(b_new))
+        b = b_new
+        if done:
+            break
+
+    beta = W*beta
+    a = Ybar - b*Xbar
+    xi = Xbar + beta
+    xm = (W*xi).sum(axis=-1, keepdims=True)/W.sum(axis=-1, keepdims=True)
+    sb = np.sqrt(1/(W*(xi - xm)**2).sum(axis=-1))
+    sa = np.sqrt(1/W.sum(axis=-1) + xm[..., 0]**2*sb**2)
+    return b[..., 0], a[..., 0], sb, sa
+
+# Intersection of a line with the GMWL (d18O, dD)
+
+def gmwl_intersection(slope, intercept):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (intercept - gmwl_intercept)/(gmwl_slope - slope)
+    return x, gmwl_slope*x + gmwl_intercept
+
+def fit(x, y, sx=None, sy=None, method='york', b0=None):
+    if method == 'york':
+        return york(x, y, sx, sy, b0=b0)[:2]
+    return ols(x, y)
+
+#%% Bootstrap
+
+# Bootstrap a fit: n_boot resamples (with replacement) of the n samples, fitted at once.
+# Returns a dict with the fit on the data, bootstrap standard errors and conf_level intervals of slope, intercept
+# and the GMWL intersection
+
+def bootstrap(x, y, sx=None, sy=None, method='york', n_boot=2000, conf_level=0.95, seed=None):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if method == 'york':
+        sx, sy = np.asarray(sx, dtype=float), np.asarray(sy, dtype=float)
+
+    slope, intercept = fit(x, y, sx, sy, method)
+    ix, iy = gmwl_intersection(slope, intercept)
+
+    # Resamples start from the slope of the full data set, which is close to theirs
+    idx = np.random.default_rng(seed).integers(0, x.size, (n_boot, x.size))
+    if method == 'york':
+        b_slope, b_intercept = fit(x[idx], y[idx], sx[idx], sy[idx], method, b0=slope)
+    else:
+        b_slope, b_intercept = fit(x[idx], y[idx], method=method)
+    b_ix, b_iy = gmwl_intersection(b_slope, b_intercept)
+
+    lo, hi = 50*(1 - conf_level), 50*(1 + conf_level)
+    out = {'n': x.size, 'method': method}
+    for name, value, boot in (('slope', slope, b_slope), ('intercept', intercept, b_intercept),
+                              ('gmwl_d18O', ix, b_ix), ('gmwl_dD', iy, b_iy)):
+        ok = np.isfinite(boot)
+        out[name] = float(value)
+        out[name + '_se'] = float(np.std(boot[ok]))
+        out[name + '_lo'], out[name + '_hi'] = np.percentile(boot[ok], [lo, hi]) if ok.any() else (np.nan, np.nan)
+    return out
+
+#%% Master list groups
+
+# Lake samples and samples around the lake (the default LEL data set)
+
+def lel_samples(master, types=('Lake',), subgroups=('Around',)):
+    keep = master['Type'].isin(types) | master['Subgroup'].isin(subgroups)
+    return master[keep & master['d18O'].notna() & master['dD'].notna()]
+
+def sample_sd(df):
+    sx = df['d18O_SD'].fillna(default_sd['d18O']).clip(lower=min_sd['d18O']).to_numpy(dtype=float)
+    sy = df['dD_SD'].fillna(default_sd['dD']).clip(lower=min_sd['dD']).to_numpy(dtype=float)
+    return sx, sy
+
+# Fit the LEL of every group with at least min_n samples (by = 'Subgroup', 'Site_name' or None for all samples).
+# Returns a DataFrame with one row per group and method
+
+def fit_groups(samples, by='Subgroup', methods=('ols', 'york'), n_boot=2000, conf_level=0.95, min_n=3, seed=None):
+    groups = [('all', samples)] if by is None else samples.groupby(by)
+    rows = []
+    for name, g in groups:
+        if len(g) < min_n:
+            continue
+        x = g['d18O'].to_numpy(dtype=float)
+        y = g['dD'].to_numpy(dtype=float)
+        sx, sy = sample_sd(g)
+        for method in methods:
+            row = {'group': name}
+            row.update(bootstrap(x, y, sx, sy, method, n_boot, conf_level, seed))
+            rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:17 2026
+
+@author: mcustado
+"""
+import numpy as np
+import lake_balance_functions as lbf
+
+########## Bayesian calibration of the hydrological balance (Section 5.2.2) #################
+
+# Instead of solving hydro_balance as a square system at one point, the unknowns (humidity, groundwater
+# flux, end-member isotopes, ...) are given priors and sampled with an affine-invariant ensemble sampler
+# (Goodman and Weare, 2010; stretch move as in Foreman-Mackey et al., 2013).
+# Every walker is evaluated in one vectorized call, so the cost per step is a handful of numpy operations
+# regardless of the number of walkers.
+
+# Let:
+# theta = array of walker positions, shape (n_walkers, n_params)
+# priors = dict of {parameter name: ('uniform', low, high) or ('normal', mean, sd)}
+# fixed = values for every model parameter that is not given a prior
+
+#%% Default inputs (same values used in custado_et_al_2024_bear_lake_mass_balance_2)
+
+# Known discharge values (m3/yr)
+
+fluxes = {'f_inlet': 317867056.26687,
+          'f_creek': 145049044.909472,
+          'f_precip': 107856450.331302,
+          'f_outlet': 352639058.615613}
+
+# Observed steady-state lake composition and its uncertainty (per mil)
+
+observations = {'dX_S_O': -8.75978345841666,
+                'dX_S_D': -86.4422222222222,
+                'sd_O': 0.1,
+                'sd_D': 0.5}
+
+# Model parameters held constant unless given a prior. dX_P is evaporation flux-weighted precipitation
+# (used for dX_A); the dX_precip end-members in lbf.end_members are used for the inflow balance
+
+fixed = dict({'h': 0.62,
+              'temp': 11.15,
+              'f_gwater': 0.0,
+              'dX_P_O': -11.70,
+              'dX_P_D': -84.02,
+              'k': 1}, **lbf.end_members)
+
+priors = {'h': ('uniform', 0.4, 0.95),
+          'f_gwater': ('uniform', 0, 300000000),
+          'dX_gwater_O': ('normal', lbf.end_members['dX_gwater_O'], 0.5),
+          'dX_gwater_D': ('normal', lbf.end_members['dX_gwater_D'], 4)}
+
+#%% Vectorized model and probability functions
+
+# Evaluate the water and isotope balance (equations 1-4 of lbf.hydro_balance) for every walker.
+# p: dict of parameter values (scalars or arrays of length n_walkers)
+# Returns X, f_evap, dX_I and the predicted steady-state lake composition for both isotopes
+
+def balance_model(p, fluxes):
+    f_in = fluxes['f_inlet'] + fluxes['f_creek'] + fluxes['f_precip'] + p['f_gwater']
+    f_evap = f_in - fluxes['f_outlet']
+    x_ = f_evap/f_in
+
+    out = {'x': x_, 'f_evap': f_evap}
+
+    for suffix, iso in (('_O', 'd18O'), ('_D', 'dD')):
+        dX_I = ((p['dX_inlet'+suffix]*fluxes['f_inlet'] + p['dX_creek'+suffix]*fluxes['f_creek'] +
+                 p['dX_precip'+suffix]*fluxes['f_precip'] + p['dX_gwater'+suffix]*p['f_gwater']) / f_in)
+
+        alfa, ep_eq, ep_k = lbf.frac_factors(iso, p['temp'], p['h'])
+        dX_A = lbf.isotope_atm(p['dX_P'+suffix], ep_eq, p['k'])
+        dX_LS, limit = lbf.mass_balance_ssx(p['h'], ep_k, ep_eq, alfa, dX_A, dX_I, x_)
+
+        out['dX_I'+suffix] = dX_I
+        out['dX_LS'+suffix] = dX_LS
+
+    return out
+
+# Log-prior for every walker. Returns -inf outside uniform bounds
+
+def log_prior(theta, names, priors):
+    lp = np.zeros(theta.shape[0])
+    for j, name in enumerate(names):
+        kind, a, b = priors[name]
+        if kind == 'uniform':
+            lp = lp + np.where((theta[:, j] >= a) & (theta[:, j] <= b), -np.log(b - a), -np.inf)
+        elif kind == 'normal':
+            lp = lp - 0.5*((theta[:, j] - a)/b)**2 - np.log(b*np.sqrt(2*np.pi))
+        else:
+            raise ValueError("Unknown prior type: " + str(kind))
+    return lp
+
+# Map walker positions onto the full parameter set
+
+def walker_params(theta, names, fixed):
+    p = dict(fixed)
+    for j, name in enumerate(names):
+        p[name] = theta[:, j]
+    return p
+
+# Gaussian log-likelihood of the observed lake composition given the balance_model prediction.
+# Non-physical states (no evaporation, lake beyond its enrichment limit) get -inf
+
+def log_likelihood(theta, names, fixed, obs, fluxes):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = balance_model(walker_params(theta, names, fixed), fluxes)
+        ll = (-0.5*((m['dX_LS_O'] - obs['dX_S_O'])/obs['sd_O'])**2
+              - 0.5*((m['dX_LS_D'] - obs['dX_S_D'])/obs['sd_D'])**2)
+    ll = np.where((m['x'] > 0) & (m['x'] < 1) & np.isfinite(ll), ll, -np.inf)
+    return ll
+
+def log_posterior(theta, names, priors, fixed, obs, fluxes):
+    lp = log_prior(theta, names, priors)
+    ok = np.isfinite(lp)
+    out = np.full(theta.shape[0], -np.inf)
+    if ok.any():
+        out[ok] = lp[ok] + log_likelihood(theta[ok], names, fixed, obs, fluxes)
+    return out
+
+#%% Affine-invariant ensemble sampler
+
+# log_prob: function of theta (n_walkers, n_params) returning an array of n_walkers log-probabilities
+# p0: initial walker positions. n_walkers must be even and at least 2*n_params
+# a: stretch scale; thin: keep every thin-th step (long chains do not need to be stored in full)
+
+def ensemble_sampler(log_prob, p0, n_steps, a=2.0, thin=1, seed=None):
+    rng = np.random.default_rng(seed)
+
+    walkers = np.array(p0, dtype=float)
+    n_walkers, n_dim = walkers.shape
+    if n_walkers % 2 or n_walkers < 2*n_dim:
+        raise ValueError("n_walkers must be even and at least twice the number of parameters")
+
+    lp = log_prob(walkers)
+    if not np.all(np.isfinite(lp)):
+        raise ValueError("Initial walker positions must have finite log-probability")
+
+    halves = (np.arange(0, n_walkers//2), np.arange(n_walkers//2, n_walkers))
+
+    n_keep = n_steps//thin
+    chain = np.empty((n_keep, n_walkers, n_dim))
+    lp_chain = np.empty((n_keep, n_walkers))
+    n_accepted = np.zeros(n_walkers)
+
+    for step in range(n_steps):
+        for s in (0, 1):
+            active, other = halves[s], halves[1 - s]
+            n = len(active)
+
+            # Propose by stretching each active walker towards a random walker of the complementary half
+            z = ((a - 1)*rng.random(n) + 1)**2/a
+            partners = walkers[other[rng.integers(0, len(other), n)]]
+            proposal = partners + z[:, None]*(walkers[active] - partners)
+
+            lp_new = log_prob(proposal)
+            log_r = (n_dim - 1)*np.log(z) + lp_new - lp[active]
+            accept = np.log(rng.random(n)) < log_r
+
+            walkers[active[accept]] = proposal[accept]
+            lp[active[accept]] = lp_new[accept]
+            n_accepted[active] += accept
+
+        if (step + 1) % thin == 0:
+            chain[step//thin] = walkers
+            lp_chain[step//thin] = lp
+
+    return chain, lp_chain, n_accepted/n_steps # Returns chain (n_kept, n_walkers, n_params), log-probabilities and acceptance fraction per walker
+
+# Draw initial walkers from the priors, redrawing any that fall in a zero-probability region
+
+def initial_walkers(names, priors, log_prob, n_walkers, rng, max_tries=100):
+    def draw(n):
+        cols = []
+        for name in names:
+            kind, a, b = priors[name]
+            cols.append(rng.uniform(a, b, n) if kind == 'uniform' else rng.normal(a, b, n))
+        return np.column_stack(cols)
+
+    p0 = draw(n_walkers)
+    for i in range(max_tries):
+        bad = ~np.isfinite(log_prob(p0))
+        if not bad.any():
+            return p0
+        p0[bad] = draw(bad.sum())
+    raise RuntimeError("Could not initialize walkers with finite posterior probability; check priors")
+
+#%% Calibration and summaries
+
+# Run the calibration. Returns a dict with the posterior chains of the sampled parameters, the derived
+# quantities (X, f_evap, dX_I_O, dX_I_D, predicted lake composition), log-probabilities and acceptance
+
+def calibrate(priors=priors, fixed=fixed, obs=observations, fluxes=fluxes,
+              n_walkers=32, n_steps=5000, burn=1000, thin=1, seed=None):
+    names = list(priors)
+    unknown = [name for name in names if name not in fixed]
+    if unknown:
+        raise ValueError("Priors given for unknown parameters: " + ", ".join(unknown))
+
+    rng = np.random.default_rng(seed)
+
+    def log_prob(theta):
+        return log_posterior(theta, names, priors, fixed, obs, fluxes)
+
+    p0 = initial_walkers(names, priors, log_prob, n_walkers, rng)
+    chain, lp_chain, acceptance = ensemble_sampler(log_prob, p0, n_steps, thin=thin, seed=rng)
+
+    chain = chain[burn//thin:]
+    lp_chain = lp_chain[burn//thin:]
+
+    flat = chain.reshape(-1, len(names))
+    derived = balance_model(walker_params(flat, names, fixed), fluxes)
+    samples = {name: chain[:, :, j] for j, name in enumerate(names)}
+    for key, val in derived.items():
+        samples[key] = np.broadcast_to(val, flat.shape[:1]).reshape(chain.shape[:2])
+
+    return {'names': names, 'chain': chain, 'log_prob': lp_chain,
+            'acceptance': acceptance, 'samples': samples}
+
+# Posterior summaries for every sampled and derived quantity
+
+def summarize_chain(result, percentiles=(15.9, 50, 84.1)):
+    summary = {}
+    for key, val in result['samples'].items():
+        flat = np.ravel(val)
+        stats = {'mean': np.nanmean(flat), 'sd': np.nanstd(flat)}
+        for q, v in zip(percentiles, np.nanpercentile(flat, percentiles)):
+            stats['p'+str(q)] = v
+        summary[key] = stats
+    return summary
+
+def print_summary(result, percentiles=(15.9, 50, 84.1)):
+    summary = summarize_chain(result, percentiles)
+    print("Number of walkers:\t", result['chain'].shape[1],
+          "\nSamples kept per walker:\t", result['chain'].shape[0],
+          "\nMean acceptance fraction:\t", np.mean(result['acceptance']))
+    for key, stats in summary.items():
+        print("\n" + key + ":")
+        for name, v in stats.items():
+            print(name + ":\t", v)
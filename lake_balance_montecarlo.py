@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:32:16 2026
+
+@author: mcustado
+"""
+import numpy as np
+import lake_balance_functions as lbf
+import lake_balance_results as lbr
+import lake_balance_threads as lbth
+
+########## Chunked, low-memory Monte Carlo ensembles #################
+
+# Runs the uncertainty/scenario forward model (lbf.forward_model: inputs -> dX_A, dX_E, X) on ensembles that are
+# generated and evaluated block by block, so peak memory is set by the block size (chunk) and not by the number of
+# simulations. Each block has its own random stream (SeedSequence(seed, spawn_key=(block,))), so a run is
+# reproducible for a given seed and chunk size.
+
+# Memory/precision policy:
+    # dtype = 'float64': same arithmetic as the original scripts
+    # dtype = 'float32': draws and model evaluation in single precision (half the memory per draw).
+    #   Accuracy against float64 on the same draws (compare_precision, 10^6 draws, script inputs):
+    #       d18O (uncertainty and glacial scenario inputs): X within 3e-6 absolute (8e-6 relative),
+    #           dX_E and dX_A within 1.5e-4 per mil
+    #       dD: X within 1e-6 absolute (2e-6 relative), dX_E and dX_A within 2.2e-4 per mil
+    #   i.e. 3-4 orders of magnitude below the Monte Carlo spread of the outputs (sd of X 0.006-0.02).
+    #   Means and variances are always accumulated in float64. float32 draws come from a different random stream
+    #   than float64 draws, so the two modes agree statistically, not draw by draw.
+    # exact = False: outputs are not stored. Mean, standard deviation, minimum and maximum are exact (streaming);
+    #   percentiles come from a fixed-bin histogram whose range is set from the first block (widened by margin),
+    #   so their error is at most one bin width (range*(1 + 2*margin)/bins). Values outside the range are counted
+    #   in n_outside, and percentiles falling there are clipped to the minimum/maximum.
+    # exact = True: outputs are stored (one array of sim values per output, in dtype) and summarized with
+    #   lake_balance_results.summary_stats; inputs are still generated block by block.
+    # threads: evaluate each block on a thread pool (lake_balance_threads; same results as the serial evaluation)
+
+# Input specification (dict keyed by the forward_model argument names h, temp, dX_P, dX_S, dX_I):
+    # a number: fixed value
+    # ('uniform', low, high)
+    # ('normal', mean, sd)
+
+output_names = ['X', 'dX_E', 'dX_A', 'E']
+
+#%% Random inputs
+
+def block_rng(seed, block):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+
+def draw(rng, spec, n, dtype=np.float64):
+    dtype = np.dtype(dtype).type
+    if np.isscalar(spec):
+        return dtype(spec)
+    kind, a, b = spec
+    a, b = dtype(a), dtype(b)
+    if kind == 'uniform':
+        return a + (b - a)*rng.random(n, dtype=dtype)
+    if kind == 'normal':
+        return a + b*rng.standard_normal(n, dtype=dtype)
+    raise ValueError('Unknown distribution: ' + str(kind))
+
+def draw_block(seed, block, inputs, n, dtype=np.float64):
+    rng = block_rng(seed, block)
+    return {name: draw(rng, inputs[name], n, dtype) for name in ('h', 'temp', 'dX_P', 'dX_S', 'dX_I')}
+
+def evaluate(iso, draws, k=1, total_inflow=None, threads=None):
+    args = (iso, draws['h'], draws['temp'], draws['dX_P'], draws['dX_S'], draws['dX_I'], k)
+    if threads is None:
+        dX_A, dX_E, x_ = lbf.forward_model(*args)
+    else:
+        dX_A, dX_E, x_ = lbth.forward_model(*args, threads=threads)
+    out = {'X': x_, 'dX_E': dX_E, 'dX_A': dX_A}
+    if total_inflow is not None:
+        out['E'] = x_*total_inflow
+    return out
+
+#%% Streaming statistics
+
+def new_accumulator(lo, hi, bins):
+    return {'n': 0, 'n_nan': 0, 'mean': 0.0, 'm2': 0.0, 'min': np.inf, 'max': -np.inf,
+            'lo': lo, 'width': (hi - lo)/bins, 'counts': np.zeros(bins + 2, dtype=np.int64)}
+
+# Pilot range for the histogram, from the first block
+
+def pilot_range(values, margin):
+    v = values[np.isfinite(values)]
+    if v.size == 0:
+        return -1.0, 1.0
+    lo, hi = float(v.min()), float(v.max())
+    pad = margin*(hi - lo) if hi > lo else max(abs(lo), 1.0)*1e-6
+    return lo - pad, hi + pad
+
+def accumulate(acc, values):
+    v = np.ravel(values)
+    nan = np.isnan(v)
+    if nan.any():
+        acc['n_nan'] += int(nan.sum())
+        v = v[~nan]
+    n_b = v.size
+    if n_b == 0:
+        return acc
+
+    # Chan et al. parallel merge of mean and sum of squared deviations, in float64
+    mean_b = np.mean(v, dtype=np.float64)
+    m2_b = np.sum(np.square(v - mean_b, dtype=np.float64))
+    n = acc['n'] + n_b
+    delta = mean_b - acc['mean']
+    acc['mean'] += delta*n_b/n
+    acc['m2'] += m2_b + delta**2*acc['n']*n_b/n
+    acc['n'] = n
+
+    acc['min'] = min(acc['min'], float(v.min()))
+    acc['max'] = max(acc['max'], float(v.max()))
+
+    bins = acc['counts'].size - 2
+    idx = np.floor((v - acc['lo'])/acc['width']).astype(np.int64) + 1
+    acc['counts'] += np.bincount(np.clip(idx, 0, bins + 1), minlength=bins + 2)
+    return acc
+
+# Merge a second accumulator (same histogram range and bins) into acc
+
+def merge_accumulators(acc, other):
+    if other['n'] == 0:
+        acc['n_nan'] += other['n_nan']
+        return acc
+    n = acc['n'] + other['n']
+    delta = other['mean'] - acc['mean']
+    acc['mean'] += delta*other['n']/n
+    acc['m2'] += other['m2'] + delta**2*acc['n']*other['n']/n
+    acc['n'] = n
+    acc['n_nan'] += other['n_nan']
+    acc['min'] = min(acc['min'], other['min'])
+    acc['max'] = max(acc['max'], other['max'])
+    acc['counts'] += other['counts']
+    return acc
+
+# Summary record (same keys as lake_balance_results.summary_stats, plus n_outside)
+
+def finalize(acc, quantiles=lbr.default_quantiles):
+    n = acc['n']
+    stats = {'n': n, 'n_nan': acc['n_nan']}
+    if n == 0:
+        stats.update(lbr.summary_stats([], quantiles))
+        stats['n_nan'] = acc['n_nan']
+        return stats
+
+    counts = acc['counts']
+    cum = np.cumsum(counts)
+    stats.update({'mean': acc['mean'], 'std': np.sqrt(acc['m2']/n), 'min': acc['min'], 'max': acc['max']})
+    for q in quantiles:
+        rank = q/100*(n - 1)
+        j = int(np.searchsorted(cum, rank, side='right'))
+        if j == 0:
+            value = acc['min']
+        elif j >= counts.size - 1:
+            value = acc['max']
+        else:
+            before = cum[j - 1] if j > 0 else 0
+            value = acc['lo'] + acc['width']*(j - 1 + (rank - before + 0.5)/counts[j])
+            value = min(max(value, acc['min']), acc['max'])
+        stats['p' + lbr.label(q)] = value
+    stats['n_outside'] = int(counts[0] + counts[-1])
+    return stats
+
+#%% Ensemble
+
+# Run sim draws in blocks of chunk draws.
+# inputs: input specification (see above); k: seasonality factor; total_inflow: adds E = X*total_inflow
+# keep: number of leading draws (inputs and outputs) to return for plotting
+# threads: number of threads per block (None: serial)
+# labels: added to every record after the isotope (e.g. period)
+# Returns {'records': summary records per output, 'sample': kept draws}
+
+def run_ensemble(iso, inputs, sim, k=1, total_inflow=None, dtype='float64', chunk=10**6, seed=None, exact=False,
+                 quantiles=lbr.default_quantiles, bins=2**14, margin=0.5, keep=0, threads=None, **labels):
+    dtype = np.dtype(dtype)
+    seed = np.random.SeedSequence().entropy if seed is None else seed
+    n_blocks = -(-sim//chunk)
+
+    names = [name for name in output_names if name != 'E' or total_inflow is not None]
+    stored = {name: np.empty(sim, dtype=dtype) for name in names} if exact else None
+    accs = None
+    sample = {}
+
+    for block in range(n_blocks):
+        start = block*chunk
+        n = min(chunk, sim - start)
+        draws = draw_block(seed, block, inputs, n, dtype)
+        out = evaluate(iso, draws, k, total_inflow, threads)
+
+        if exact:
+            for name in names:
+                stored[name][start:start + n] = out[name]
+        else:
+            if accs is None:
+                accs = {name: new_accumulator(*pilot_range(out[name], margin), bins) for name in names}
+            for name in names:
+                accumulate(accs[name], out[name])
+
+        if start < keep:
+            m = min(keep - start, n)
+            for name, values in list(draws.items()) + list(out.items()):
+                part = np.broadcast_to(values, (n,))[:m].copy()
+                sample[name] = np.concatenate([sample[name], part]) if name in sample else part
+
+    records = []
+    for name in names:
+        rec = dict(iso=iso, **labels)
+        rec['variable'] = name
+        rec.update(lbr.summary_stats(stored[name], quantiles) if exact else finalize(accs[name], quantiles))
+        records.append(rec)
+
+    return {'records': records, 'sample': sample}
+
+#%% Precision check
+
+# Largest absolute and relative differences between float32 and float64 evaluation of the same draws
+
+def compare_precision(iso, inputs, n=10**6, k=1, seed=0):
+    d64 = draw_block(seed, 0, inputs, n, np.float64)
+    d32 = {name: np.float32(v) if np.isscalar(v) else v.astype(np.float32) for name, v in d64.items()}
+    o64 = evaluate(iso, d64, k)
+    o32 = evaluate(iso, d32, k)
+    diff = {}
+    for name in o64:
+        err = np.abs(o32[name].astype(np.float64) - o64[name])
+        diff[name] = {'max_abs': float(np.nanmax(err)),
+                      'max_rel': float(np.nanmax(err/np.abs(o64[name]))),
+                      'spread': float(np.nanstd(o64[name]))}
+    return diff
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:21:43 2026
+
+@author: mcustado
+"""
+import itertools
+import numpy as np
+from scipy.stats import norm
+import lake_balance_functions as lbf
+
+########## Polynomial chaos surrogate of X for Sobol sensitivity analysis #################
+
+# X is a smooth function of five bounded inputs (hum, temp, dX_P, dX_S, dX_I). Expanding it in a basis of
+# orthonormal Legendre polynomials over the problem bounds (uniform inputs, as in custado_et_al_2024_sensitivity_sobol),
+# the Sobol indices follow directly from the squared coefficients (Sudret, 2008):
+    # Var(Y) = sum of c_a^2 over all multi-indices a except the constant term
+    # S1_i = sum over a with only input i active
+    # S2_ij = sum over a with only inputs i and j active
+    # ST_i = sum over a with input i active
+# A few hundred model runs are enough to fit the expansion, after which the surrogate is evaluated for free.
+
+# Let:
+# problem = SALib-style dict with 'num_vars', 'names' and 'bounds'
+# model = function taking an (N, num_vars) array of inputs and returning N outputs
+
+#%% Models
+
+# X from E_I (used in custado_et_al_2024_sensitivity_sobol), inputs ordered [hum, temp, dX_P, dX_S, dX_I]
+
+def model_E_I(iso, k=1):
+    def model(X):
+        dX_A, dX_E, x_ = lbf.forward_model(iso, X[:, 0], X[:, 1], X[:, 2], X[:, 3], X[:, 4], k)
+        return x_
+    return model
+
+# X from the calc_x scenario model (Section 6.3, d18O). calc_x returns (X - x_), which is linear in x_,
+# so its root is calc_x evaluated at x_ = 0
+
+def model_calc_x():
+    def model(X):
+        return lbf.calc_x(0, X[:, 3], X[:, 4], X[:, 2], X[:, 0], X[:, 1])
+    return model
+
+#%% Basis
+
+# All multi-indices of total degree <= degree, constant term first
+
+def multi_indices(num_vars, degree):
+    idx = [a for a in itertools.product(range(degree + 1), repeat=num_vars) if sum(a) <= degree]
+    idx.sort(key=lambda a: (sum(a), tuple(-i for i in a)))
+    return np.array(idx)
+
+# Legendre polynomials P_0..P_degree at u in [-1, 1], normalized to unit variance under the uniform distribution
+
+def legendre_table(u, degree):
+    P = np.empty((degree + 1,) + u.shape)
+    P[0] = 1
+    if degree > 0:
+        P[1] = u
+    for n in range(1, degree):
+        P[n + 1] = ((2*n + 1)*u*P[n] - n*P[n - 1])/(n + 1)
+    return P*np.sqrt(2*np.arange(degree + 1) + 1).reshape((-1,) + (1,)*u.ndim)
+
+# Design matrix: one row per sample, one column per multi-index
+
+def design_matrix(X, bounds, indices):
+    bounds = np.asarray(bounds, dtype=float)
+    u = 2*(X - bounds[:, 0])/(bounds[:, 1] - bounds[:, 0]) - 1
+    P = legendre_table(u, indices.max())
+    A = np.ones((X.shape[0], len(indices)))
+    for j in range(X.shape[1]):
+        A *= P[indices[:, j], :, j].T
+    return A
+
+# Latin hypercube sample within the problem bounds
+
+def latin_hypercube(problem, n, rng):
+    d = problem['num_vars']
+    u = (rng.permuted(np.tile(np.arange(n), (d, 1)), axis=1).T + rng.random((n, d)))/n
+    bounds = np.asarray(problem['bounds'], dtype=float)
+    return bounds[:, 0] + u*(bounds[:, 1] - bounds[:, 0])
+
+#%% Fit, evaluate and analyze
+
+# Fit the expansion by least squares.
+# n_train defaults to twice the number of basis terms; n_valid extra model runs give an independent validation error.
+# Returns a dict with the coefficients, the basis, the validation errors and the number of model evaluations used
+
+def fit_pce(model, problem, degree=4, n_train=None, n_valid=100, seed=None):
+    rng = np.random.default_rng(seed)
+    indices = multi_indices(problem['num_vars'], degree)
+    if n_train is None:
+        n_train = 2*len(indices)
+
+    X = latin_hypercube(problem, n_train, rng)
+    Y = np.asarray(model(X), dtype=float)
+    A = design_matrix(X, problem['bounds'], indices)
+    coef = np.linalg.lstsq(A, Y, rcond=None)[0]
+
+    pce = {'problem': problem, 'indices': indices, 'coef': coef, 'X': X, 'Y': Y, 'n_evals': n_train + n_valid}
+
+    # Leave-one-out error from the hat matrix (no extra model runs)
+    Q = np.linalg.qr(A)[0]
+    h = np.sum(Q**2, axis=1)
+    resid = Y - A @ coef
+    pce['loo_error'] = np.mean((resid/(1 - h))**2)/np.var(Y)
+
+    if n_valid:
+        Xv = latin_hypercube(problem, n_valid, rng)
+        Yv = np.asarray(model(Xv), dtype=float)
+        err = evaluate(pce, Xv) - Yv
+        pce['valid_rmse'] = np.sqrt(np.mean(err**2))
+        pce['valid_max_error'] = np.max(np.abs(err))
+        pce['valid_rel_error'] = np.mean(err**2)/np.var(Yv)
+
+    return pce
+
+# Evaluate the surrogate at an (N, num_vars) array of inputs
+
+def evaluate(pce, X):
+    return design_matrix(np.atleast_2d(X), pce['problem']['bounds'], pce['indices']) @ pce['coef']
+
+# Sobol indices from a set of coefficients
+
+def sobol_from_coef(indices, coef):
+    d = indices.shape[1]
+    active = indices > 0
+    var_terms = coef[1:]**2
+    active = active[1:]
+    total = var_terms.sum()
+    n_active = active.sum(axis=1)
+
+    S1 = np.array([var_terms[(n_active == 1) & active[:, i]].sum() for i in range(d)])/total
+    ST = np.array([var_terms[active[:, i]].sum() for i in range(d)])/total
+    S2 = np.full((d, d), np.nan)
+    for i, j in itertools.combinations(range(d), 2):
+        S2[i, j] = var_terms[(n_active == 2) & active[:, i] & active[:, j]].sum()/total
+    return S1, S2, ST
+
+# Sobol indices (S1, S2, ST) read from the coefficients, in the same layout as SALib's analyze output.
+# Confidence intervals come from refitting the expansion to bootstrap resamples of the training runs
+
+def analyze(pce, n_boot=200, conf_level=0.95, seed=None, print_to_console=False):
+    S1, S2, ST = sobol_from_coef(pce['indices'], pce['coef'])
+
+    rng = np.random.default_rng(seed)
+    A = design_matrix(pce['X'], pce['problem']['bounds'], pce['indices'])
+    n = A.shape[0]
+    boot = {'S1': [], 'S2': [], 'ST': []}
+    for b in range(n_boot):
+        r = rng.integers(0, n, n)
+        coef = np.linalg.lstsq(A[r], pce['Y'][r], rcond=None)[0]
+        for key, val in zip(('S1', 'S2', 'ST'), sobol_from_coef(pce['indices'], coef)):
+            boot[key].append(val)
+
+    z = norm.ppf(0.5 + conf_level/2)
+    Si = {'S1': S1, 'S1_conf': z*np.std(boot['S1'], axis=0),
+          'S2': S2, 'S2_conf': z*np.std(boot['S2'], axis=0),
+          'ST': ST, 'ST_conf': z*np.std(boot['ST'], axis=0)}
+
+    if print_to_console:
+        names = pce['problem']['names']
+        print("Validation error (relative MSE):\t", pce.get('valid_rel_error'),
+              "\nLeave-one-out error (relative MSE):\t", pce['loo_error'],
+              "\nModel evaluations:\t", pce['n_evals'])
+        print("\n\tST\tST_conf\tS1\tS1_conf")
+        for i, name in enumerate(names):
+            print(name, "\t", Si['ST'][i], "\t", Si['ST_conf'][i], "\t", Si['S1'][i], "\t", Si['S1_conf'][i])
+        print("\n\tS2\tS2_conf")
+        for i, j in itertools.combinations(range(len(names)), 2):
+            print("(" + names[i] + ", " + names[j] + ")\t", Si['S2'][i, j], "\t", Si['S2_conf'][i, j])
+
+    return Si
+
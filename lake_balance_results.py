@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:30:22 2026
+
+@author: mcustado
+"""
+import json
+import numpy as np
+import pandas as pd
+
+########## Summary statistics and structured output of simulation results #################
+
+# Every statistic is computed on the same NaN-free values: NaNs are dropped once and counted.
+# All requested percentiles, the median, minimum and maximum come from a single np.partition call per variable
+# (linear interpolation between order statistics, as np.percentile), instead of one full sort per statistic.
+# Results are kept as flat records (one per isotope, period and variable) that can be written to JSON, CSV or Parquet.
+
+default_quantiles = (15.9, 50, 84.1)
+
+#%% Statistics
+
+# Returns a dict with n, n_nan, mean, std, min, max and one 'pXX' entry per requested percentile (0-100).
+# axis: None summarizes all values; an integer summarizes along that axis and every entry is an array over the
+# other axes (e.g. axis=1 for one row of draws per scenario). The statistics are the same, with one sort along the
+# axis instead of np.partition
+
+def summary_stats(values, quantiles=default_quantiles, axis=None):
+    if axis is not None:
+        return _axis_stats(np.asarray(values, dtype=float), quantiles, axis)
+    x = np.ravel(np.asarray(values, dtype=float))
+    nan = np.isnan(x)
+    x = x[~nan]
+    n = x.size
+
+    stats = {'n': n, 'n_nan': int(nan.sum())}
+    if n == 0:
+        stats.update({'mean': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan})
+        stats.update({'p' + label(q): np.nan for q in quantiles})
+        return stats
+
+    pos = np.asarray(quantiles, dtype=float)/100*(n - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, n - 1)
+    kth = np.unique(np.concatenate([lo, hi, [0, n - 1]]))
+    part = np.partition(x, kth)
+
+    frac = pos - lo
+    qvals = part[lo] + (part[hi] - part[lo])*frac
+
+    stats.update({'mean': x.mean(), 'std': x.std(), 'min': part[0], 'max': part[n - 1]})
+    stats.update({'p' + label(q): v for q, v in zip(quantiles, qvals)})
+    return stats
+
+def _axis_stats(values, quantiles, axis):
+    x = np.moveaxis(values, axis, -1)
+    shape = x.shape[:-1]
+    Y = x.reshape(-1, x.shape[-1])
+    nan = np.isnan(Y)
+    n = Y.shape[1] - nan.sum(axis=1)
+    rows = np.arange(Y.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(nan, 0, Y).sum(axis=1)/n
+        std = np.sqrt(np.where(nan, 0, (Y - mean[:, None])**2).sum(axis=1)/n)
+    Ys = np.sort(Y, axis=1) # NaNs last
+    last = np.maximum(n - 1, 0)
+    empty = n == 0
+
+    stats = {'n': n, 'n_nan': nan.sum(axis=1), 'mean': mean, 'std': std,
+             'min': np.where(empty, np.nan, Ys[:, 0]), 'max': np.where(empty, np.nan, Ys[rows, last])}
+    pos = np.asarray(quantiles, dtype=float)[None, :]/100*last[:, None]
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, last[:, None])
+    a = np.take_along_axis(Ys, lo, axis=1)
+    b = np.take_along_axis(Ys, hi, axis=1)
+    q = np.where(empty[:, None], np.nan, a + (b - a)*(pos - lo))
+    for j, qq in enumerate(quantiles):
+        stats['p' + label(qq)] = q[:, j]
+    return {key: v.reshape(shape) for key, v in stats.items()}
+
+# Key suffix of a percentile (e.g. 15.9 -> '15.9', stored as 'p15.9')
+
+def label(q):
+    return ('%g' % q)
+
+# Summary records for several variables. labels (e.g. iso='dD', period='current') are added to every record
+
+def summarize(variables, quantiles=default_quantiles, **labels):
+    records = []
+    for name, values in variables.items():
+        rec = dict(labels)
+        rec['variable'] = name
+        rec.update(summary_stats(values, quantiles))
+        records.append(rec)
+    return records
+
+#%% Output
+
+def to_frame(records):
+    return pd.DataFrame.from_records(records)
+
+# Write records to JSON, CSV or Parquet (chosen from the file extension)
+
+def write_records(records, path):
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump([{k: _plain(v) for k, v in rec.items()} for rec in records], f, indent=1)
+    elif path.endswith('.parquet'):
+        to_frame(records).to_parquet(path, index=False)
+    else:
+        to_frame(records).to_csv(path, index=False)
+
+def read_records(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path).to_dict('records')
+    return pd.read_csv(path).to_dict('records')
+
+def _plain(v):
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and np.isnan(v):
+        return None
+    return v
+
+# Print one record in the layout of the original text summaries
+
+def print_record(rec, quantiles=default_quantiles):
+    print("\n" + rec['variable'] + " output:",
+          "\nmean output:\t", rec['mean'],
+          "\nmedian output:\t", rec.get('p50', np.nan),
+          "\nstdev output:\t", rec['std'],
+          *["\n" + label(q) + " perc output:\t " + str(rec['p' + label(q)]) for q in quantiles if q != 50],
+          "\nminimum output:\t", rec['min'],
+          "\nmaximum output:\t", rec['max'])
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:22:25 2026
+
+@author: mcustado
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, qmc
+from SALib.analyze.sobol import analyze
+from SALib.sample.sobol import sample
+import lake_balance_functions as lbf
+import lake_balance_results as lbr
+import lake_balance_threads as lbth
+
+########## Climate scenario definitions and batched Sobol analysis (Section 6.3) #################
+
+# Scenario inputs for the LIG, current, future and glacial (LGP) periods, as in custado_et_al_2024_bear_lake_climate_scenarios.
+# all arrays = [LIG, current, future, glacial (LGP)]
+
+periods = ['lig', 'current', 'future', 'glacial']
+
+climate = {'hum': 0.62, # current humidity
+           'temp': 11.15, # current temperature
+           'hum_dec': [0.1, 0, 0.1, 0.1], # humidity decrease
+           'temp_inc': [1, 0, 1, -6], # temperature increase (oC)
+           'hum_unc': 0.03, # stdev, normal distribution
+           'temp_unc': 0.3} # stdev, normal distribution
+
+# Isotope inputs per period. dX_S_unc: half-widths of uniform distributions (per mil); dX_P and dX_I are fixed in
+# the period ensembles of the scenario script (their +/- 2 per mil ranges only enter the Sobol problems, see
+# period_problem). The scenario script only defines d18O; add an entry per isotope (same keys) once its period
+# inputs are available.
+
+scenario_inputs = {'d18O': {'k': [1, 1, 1, 1],
+                            'dX_P': [-11.7, -11.7, -11.7, -11.7],
+                            'dX_S': [-7.21, -8.76, -8.76, -13.13],
+                            'dX_I': [-15.77, -16.22, -16.22, -16.22],
+                            'dX_S_unc': [2, 1, 1, 0.9]}}
+
+input_names = ['hum', 'temp', 'dX_P', 'dX_S', 'dX_I']
+
+period_index = {p: i for i, p in enumerate(periods)}
+
+def _inputs(iso):
+    if iso not in scenario_inputs:
+        raise ValueError('No scenario inputs for ' + str(iso) + ' (defined: ' + ', '.join(scenario_inputs) + ')')
+    return scenario_inputs[iso]
+
+#%% Problem definitions
+
+# SALib problem for one isotope and period. Humidity and temperature are normal (bounds = [mean, stdev]),
+# isotope inputs are uniform (bounds = [low, high]); dX_P_unc and dX_I_unc are the half-widths given to dX_P and
+# dX_I for the sensitivity analysis (dX_P_O_unc and dX_I_O_unc of the scenario script)
+
+def period_problem(iso, period, dX_P_unc=2, dX_I_unc=2):
+    i = period_index[period]
+    s = _inputs(iso)
+    return {'num_vars': 5,
+            'names': list(input_names),
+            'bounds': [[climate['hum'] - climate['hum_dec'][i], climate['hum_unc']],
+                       [climate['temp'] + climate['temp_inc'][i], climate['temp_unc']],
+                       [s['dX_P'][i] - dX_P_unc, s['dX_P'][i] + dX_P_unc],
+                       [s['dX_S'][i] - s['dX_S_unc'][i], s['dX_S'][i] + s['dX_S_unc'][i]],
+                       [s['dX_I'][i] - dX_I_unc, s['dX_I'][i] + dX_I_unc]],
+            'dists': ['norm', 'norm', 'unif', 'unif', 'unif']}
+
+# Map samples on the unit hypercube onto the distributions of a problem
+
+def scale_samples(unit, problem):
+    u = np.clip(unit, 1e-12, 1 - 1e-12)
+    out = np.empty_like(u)
+    for j, (dist, (a, b)) in enumerate(zip(problem['dists'], problem['bounds'])):
+        if dist == 'norm':
+            out[..., j] = a + b*norm.ppf(u[..., j])
+        else:
+            out[..., j] = a + u[..., j]*(b - a)
+    return out
+
+#%% Batched Sobol analysis
+
+# Sobol indices of X for every isotope/period combination in one job.
+# The Saltelli design is generated once on the unit hypercube and scaled to each combination, and X is evaluated
+# for all periods of an isotope in a single vectorized call.
+# Returns a tidy DataFrame with columns iso, period, index (S1, ST, S2), param, value, conf
+
+def batched_sobol(n=1024, isos=('d18O',), periods=periods, calc_second_order=True,
+                  conf_level=0.95, seed=None):
+    unit_problem = {'num_vars': 5, 'names': list(input_names), 'bounds': [[0, 1]]*5}
+    unit = sample(unit_problem, n, calc_second_order=calc_second_order, seed=seed)
+
+    for iso in isos:
+        _inputs(iso)
+    rows = []
+    for iso in isos:
+        problems = [period_problem(iso, p) for p in periods]
+        X = np.stack([scale_samples(unit, prob) for prob in problems]) # (n_periods, n_samples, 5)
+        k = np.array([scenario_inputs[iso]['k'][period_index[p]] for p in periods])[:, None]
+
+        dX_A, dX_E, Y = lbf.forward_model(iso, X[..., 0], X[..., 1], X[..., 2], X[..., 3], X[..., 4], k)
+
+        for c, period in enumerate(periods):
+            Si = analyze(problems[c], Y[c], calc_second_order=calc_second_order, conf_level=conf_level, seed=seed)
+            for index in ('S1', 'ST'):
+                for j, name in enumerate(input_names):
+                    rows.append({'iso': iso, 'period': period, 'index': index, 'param': name,
+                                 'value': Si[index][j], 'conf': Si[index + '_conf'][j]})
+            if calc_second_order:
+                for a in range(5):
+                    for b in range(a + 1, 5):
+                        rows.append({'iso': iso, 'period': period, 'index': 'S2',
+                                     'param': input_names[a] + ':' + input_names[b],
+                                     'value': Si['S2'][a, b], 'conf': Si['S2_conf'][a, b]})
+
+    return pd.DataFrame(rows)
+
+#%% Scenario explorer
+
+# Scenarios beyond the four periods: every driver below can be given as a list of values or a (low, high) range,
+# expanded into a full-factorial or sampled design, and every scenario gets its own Monte Carlo ensemble of X.
+# Humidity and temperature are normal (mean hum/temp, stdev hum_unc/temp_unc); dX_P, dX_S and dX_I are uniform
+# (value +/- half-width *_unc). X is the closed-form steady-state solution of calc_x
+# (lbf.forward_model), so all ensembles of a batch of scenarios are evaluated in one vectorized call.
+
+driver_names = ['hum', 'temp', 'k', 'dX_P', 'dX_S', 'dX_I', 'hum_unc', 'temp_unc', 'dX_P_unc', 'dX_S_unc', 'dX_I_unc']
+
+# Driver values of one of the four periods (used for the drivers a design does not vary). They reproduce the
+# period ensembles of the scenario script: dX_P and dX_I are fixed (dX_P_unc = dX_I_unc = 0)
+
+def _climate_drivers(period):
+    i = period_index[period]
+    return {'hum': climate['hum'] - climate['hum_dec'][i], 'temp': climate['temp'] + climate['temp_inc'][i],
+            'hum_unc': climate['hum_unc'], 'temp_unc': climate['temp_unc']}
+
+def period_drivers(iso, period):
+    i = period_index[period]
+    s = _inputs(iso)
+    out = _climate_drivers(period)
+    out.update({'k': s['k'][i], 'dX_P': s['dX_P'][i], 'dX_S': s['dX_S'][i], 'dX_I': s['dX_I'][i],
+                'dX_P_unc': 0, 'dX_S_unc': s['dX_S_unc'][i], 'dX_I_unc': 0})
+    return {name: out[name] for name in driver_names}
+
+# Scenario design. drivers: {name: number | list of values | (low, high)}; missing drivers take the values of
+# base_period (for an isotope without scenario inputs, only hum, temp and their uncertainties; k, dX_P, dX_S, dX_I
+# and their uncertainties must then be given). method:
+    # 'factorial': every combination of the values; ranges are replaced by levels evenly spaced values
+    # 'random' or 'lhs': n scenarios, ranges drawn uniformly (independently or by Latin hypercube) and lists
+    #   sampled with equal probability
+# Returns a DataFrame with one row per scenario and one column per driver
+
+def design(drivers, iso='d18O', base_period='current', method='factorial', n=None, levels=5, seed=None):
+    unknown = set(drivers) - set(driver_names)
+    if unknown:
+        raise ValueError('Unknown drivers: ' + ', '.join(sorted(unknown)))
+    values = period_drivers(iso, base_period) if iso in scenario_inputs else _climate_drivers(base_period)
+    values.update(drivers)
+    missing = [name for name in driver_names if name not in values]
+    if missing:
+        raise ValueError('No scenario inputs for ' + str(iso) + '; give the drivers ' + ', '.join(missing))
+    varying = [name for name in driver_names if not np.isscalar(values[name])]
+
+    if method == 'factorial':
+        axes = [np.linspace(*values[name], levels) if isinstance(values[name], tuple)
+                else np.asarray(values[name], dtype=float) for name in varying]
+        grid = np.meshgrid(*axes, indexing='ij')
+        columns = {name: g.ravel() for name, g in zip(varying, grid)}
+        size = grid[0].size if grid else 1
+    elif method in ('random', 'lhs'):
+        if method == 'lhs':
+            unit = qmc.LatinHypercube(d=max(len(varying), 1), seed=seed).random(n)
+        else:
+            unit = np.random.default_rng(seed).random((n, len(varying)))
+        columns = {}
+        for j, name in enumerate(varying):
+            v = values[name]
+            if isinstance(v, tuple):
+                columns[name] = v[0] + unit[:, j]*(v[1] - v[0])
+            else:
+                v = np.asarray(v, dtype=float)
+                columns[name] = v[np.minimum((unit[:, j]*v.size).astype(int), v.size - 1)]
+        size = n
+    else:
+        raise ValueError('Unknown design method: ' + str(method))
+
+    return pd.DataFrame({name: columns[name] if name in columns else np.full(size, float(values[name]))
+                         for name in driver_names})
+
+# Monte Carlo ensemble of X (n draws) for every scenario of a design.
+# All scenarios use the same standardized draws (common random numbers), so differences between scenarios are not
+# masked by sampling noise. Scenarios are evaluated in batches of at most max_elements draws in total;
+# threads: evaluate each batch on a thread pool (lake_balance_threads)
+# Returns a tidy DataFrame: the design columns, iso and the summary statistics of X per scenario
+
+def explore(scenarios, iso='d18O', n=2000, quantiles=lbr.default_quantiles, seed=None, max_elements=2**22,
+            threads=None):
+    rng = np.random.default_rng(seed)
+    z_h, z_t = rng.standard_normal((2, n))
+    u_P, u_S, u_I = 2*rng.random((3, n)) - 1
+    s = {name: scenarios[name].to_numpy(dtype=float)[:, None] for name in driver_names}
+
+    batch = max(1, max_elements//n)
+    parts = []
+    for start in range(0, len(scenarios), batch):
+        b = {name: v[start:start + batch] for name, v in s.items()}
+        args = (iso, b['hum'] + b['hum_unc']*z_h, b['temp'] + b['temp_unc']*z_t, b['dX_P'] + b['dX_P_unc']*u_P,
+                b['dX_S'] + b['dX_S_unc']*u_S, b['dX_I'] + b['dX_I_unc']*u_I, b['k'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_ = lbf.forward_model(*args)[2] if threads is None else lbth.calc_x(*args, threads=threads)
+        parts.append(pd.DataFrame(lbr.summary_stats(x_, quantiles, axis=1)))
+
+    out = scenarios.reset_index(drop=True)
+    out.insert(0, 'iso', iso)
+    return pd.concat([out, pd.concat(parts, ignore_index=True)], axis=1)
+
+# Threaded explore() against the serial table for the same design and seed (threads: thread counts to compare).
+# Returns True if every table equals the serial one
+
+def check_explore(scenarios, iso='d18O', n=2000, threads=(1, 2), seed=0, max_elements=2**22):
+    ref = explore(scenarios, iso, n, seed=seed, max_elements=max_elements)
+    return all(explore(scenarios, iso, n, seed=seed, max_elements=max_elements, threads=t).equals(ref)
+               for t in threads)
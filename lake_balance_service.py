@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:36:29 2026
+
+@author: mcustado
+"""
+import sys
+import json
+import math
+import time
+import asyncio
+import functools
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+import lake_balance_functions as lbf
+import lake_balance_montecarlo as lbm
+import lake_balance_scenarios as lbs
+
+########## Local query service for steady-state and scenario what-ifs #################
+
+# A small HTTP/JSON service (asyncio, standard library only) bound to this machine, so mass balance questions
+# ("what X do we get at humidity 0.55 and 13 oC?") are answered without editing and rerunning the scripts.
+# Start it with: python lake_balance_service.py [port]
+
+# Endpoints:
+    # POST /query     {"iso": "d18O", "queries": [{"hum": 0.55, "temp": 13}, ...]}
+    #                 Each query may set iso, hum, temp, dX_P, dX_S, dX_I, k (study values otherwise) and x (X used
+    #                 for dX_LS/limit; default: the X computed from dX_S). Returns X, dX_E, dX_A, dX_LS and limit
+    #                 (mass_balance_ssx) per query; results that are not finite (e.g. at h = 1, the pole of E_I) are
+    #                 null. The batch is evaluated in one vectorized call per isotope.
+    # POST /scenario  {"iso": "d18O", "period": "glacial", "n": 100000, "percentiles": [15.9, 50, 84.1], "seed": 0}
+    #                 Returns the summary record of X (lake_balance_results keys) for the period distributions of the
+    #                 climate scenario script (lbs.period_drivers: normal hum and temp, uniform dX_S, fixed dX_P and
+    #                 dX_I; only isotopes with period inputs in lbs.scenario_inputs, currently d18O). Optional hum/temp
+    #                 replace the period's mean humidity/temperature and dX_P_unc/dX_I_unc (per mil) make dX_P/dX_I
+    #                 uniform with these half-widths (e.g. 2, as in the Sobol problems); n is limited to max_n
+    # GET /metrics    request counts and latencies (ms) per endpoint (other paths under "unknown"), cache statistics
+    # GET /health
+
+# Fractionation factors are cached per (isotope, temperature, humidity) and results of recent queries and scenario
+# runs are kept in LRU caches, so repeated questions are answered from memory.
+
+host = '127.0.0.1'
+port = 8765
+
+study = {'d18O': {'hum': 0.62, 'temp': 11.15, 'dX_P': -11.70, 'dX_S': -8.75978345841666, 'dX_I': -16.2152393388515, 'k': 1},
+         'dD': {'hum': 0.62, 'temp': 11.15, 'dX_P': -84.02, 'dX_S': -86.4422222222222, 'dX_I': -122.145607652468, 'k': 1}}
+
+query_fields = ['hum', 'temp', 'dX_P', 'dX_S', 'dX_I', 'k', 'x']
+result_fields = ['X', 'dX_E', 'dX_A', 'dX_LS', 'limit']
+
+result_cache_size = 100000
+scenario_cache_size = 256
+
+max_n = 10**7 # largest ensemble accepted by /scenario (exact summaries store n values per output)
+
+#%% Caches
+
+@functools.lru_cache(maxsize=65536)
+def factors(iso, temp, hum):
+    alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, hum)
+    return float(alfa), float(ep_eq), float(ep_k)
+
+# Caches are shared with the executor threads running scenarios, so every access holds the cache's lock
+
+def new_cache(size):
+    return {'data': OrderedDict(), 'size': size, 'hits': 0, 'misses': 0, 'lock': threading.Lock()}
+
+def cache_lookup(cache, key):
+    with cache['lock']:
+        data = cache['data']
+        if key in data:
+            data.move_to_end(key)
+            cache['hits'] += 1
+            return data[key]
+        cache['misses'] += 1
+        return None
+
+def cache_store(cache, key, value):
+    with cache['lock']:
+        data = cache['data']
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > cache['size']:
+            data.popitem(last=False)
+
+results = new_cache(result_cache_size)
+scenarios = new_cache(scenario_cache_size)
+
+#%% Queries
+
+def _complete(q, iso):
+    base = study[iso]
+    full = {name: float(q.get(name, base.get(name, math.nan))) for name in query_fields}
+    unknown = set(q) - set(query_fields) - {'iso'}
+    if unknown:
+        raise ValueError('Unknown query fields: ' + ', '.join(sorted(unknown)))
+    return full
+
+def evaluate_batch(iso, qs):
+    f = np.array([factors(iso, q['temp'], q['hum']) for q in qs])
+    v = {name: np.array([q[name] for q in qs]) for name in query_fields}
+    alfa, ep_eq, ep_k = f[:, 0], f[:, 1], f[:, 2]
+    h = v['hum']
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'): # h at or near 1 (pole of E_I)
+        dX_A = lbf.isotope_atm(v['dX_P'], ep_eq, v['k'])
+        dX_E = lbf.isotope_evap(h, ep_k, ep_eq, alfa, dX_A, v['dX_S'])
+        x_ = lbf.E_I(h, ep_k, ep_eq, alfa, dX_A, v['dX_S'], v['dX_I'])
+        x_ss = np.where(np.isnan(v['x']), x_, v['x'])
+        dX_LS, limit = lbf.mass_balance_ssx(h, ep_k, ep_eq, alfa, dX_A, v['dX_I'], x_ss)
+    return np.column_stack([x_, dX_E, dX_A, dX_LS, limit])
+
+def run_queries(body):
+    if not isinstance(body, dict) or not isinstance(body.get('queries'), list):
+        raise ValueError('Body must be an object with a list of queries')
+    if not all(isinstance(q, dict) for q in body['queries']):
+        raise ValueError('Every query must be an object')
+    default_iso = body.get('iso', 'd18O')
+    queries = body['queries']
+    out = [None]*len(queries)
+    todo = {}
+
+    for i, q in enumerate(queries):
+        iso = q.get('iso', default_iso)
+        if iso not in study:
+            raise ValueError('Unknown isotope: ' + str(iso))
+        full = _complete(q, iso)
+        key = (iso,) + tuple(full[name] for name in query_fields)
+        hit = cache_lookup(results, key)
+        if hit is None:
+            todo.setdefault(iso, []).append((i, key, full))
+        else:
+            out[i] = hit
+
+    for iso, items in todo.items():
+        values = evaluate_batch(iso, [full for _, _, full in items])
+        for (i, key, _), row in zip(items, values):
+            res = dict(zip(result_fields, (_json_float(v) for v in row)))
+            cache_store(results, key, res)
+            out[i] = res
+
+    return {'results': out}
+
+#%% Scenarios
+
+def _uniform(value, half_width):
+    return ('uniform', value - half_width, value + half_width) if half_width else value
+
+def scenario_inputs(iso, period, hum=None, temp=None, dX_P_unc=0, dX_I_unc=0):
+    d = lbs.period_drivers(iso, period)
+    return {'h': ('normal', d['hum'] if hum is None else hum, d['hum_unc']),
+            'temp': ('normal', d['temp'] if temp is None else temp, d['temp_unc']),
+            'dX_P': _uniform(d['dX_P'], dX_P_unc),
+            'dX_S': _uniform(d['dX_S'], d['dX_S_unc']),
+            'dX_I': _uniform(d['dX_I'], dX_I_unc)}
+
+def run_scenario(body):
+    if not isinstance(body, dict):
+        raise ValueError('Body must be an object')
+    iso = body.get('iso', 'd18O')
+    if iso not in lbs.scenario_inputs:
+        raise ValueError('No scenario inputs for isotope: ' + str(iso))
+    period = body.get('period', 'current')
+    if period not in lbs.period_index:
+        raise ValueError('Unknown period: ' + str(period))
+    n = int(body.get('n', 100000))
+    if not 0 < n <= max_n:
+        raise ValueError('n must be between 1 and %d' % max_n)
+    percentiles = tuple(float(q) for q in body.get('percentiles', (15.9, 50, 84.1)))
+    seed = int(body.get('seed', 0))
+    hum, temp = body.get('hum'), body.get('temp')
+    dX_P_unc, dX_I_unc = float(body.get('dX_P_unc', 0)), float(body.get('dX_I_unc', 0))
+    if dX_P_unc < 0 or dX_I_unc < 0:
+        raise ValueError('dX_P_unc and dX_I_unc must not be negative')
+
+    key = (iso, period, n, percentiles, seed, hum, temp, dX_P_unc, dX_I_unc)
+    hit = cache_lookup(scenarios, key)
+    if hit is not None:
+        return hit
+
+    k = lbs.period_drivers(iso, period)['k']
+    inputs = scenario_inputs(iso, period, hum, temp, dX_P_unc, dX_I_unc)
+    run = lbm.run_ensemble(iso, inputs, n, k=k, seed=seed, exact=True, chunk=min(n, 10**6), quantiles=percentiles,
+                           period=period)
+    rec = {key_: _json_float(v) if isinstance(v, float) else v for key_, v in run['records'][0].items()}
+    cache_store(scenarios, key, rec)
+    return rec
+
+#%% Metrics
+
+# Requests to other paths share one 'unknown' entry, so arbitrary URLs do not add entries
+
+routes = ['/query', '/scenario', '/metrics', '/health']
+
+metrics = {'started': time.time(), 'endpoints': {}}
+
+def _record(path, seconds, ok):
+    path = path if path in routes else 'unknown'
+    m = metrics['endpoints'].setdefault(path, {'count': 0, 'errors': 0, 'latency': deque(maxlen=10000)})
+    m['count'] += 1
+    m['errors'] += 0 if ok else 1
+    m['latency'].append(seconds*1000)
+
+def metrics_report():
+    report = {'uptime_s': time.time() - metrics['started'], 'endpoints': {}}
+    for path, m in metrics['endpoints'].items():
+        lat = np.array(m['latency'])
+        report['endpoints'][path] = {'count': m['count'], 'errors': m['errors'],
+                                     'latency_ms': dict(zip(['p50', 'p90', 'p99', 'max'],
+                                                            np.percentile(lat, [50, 90, 99, 100]).tolist()))}
+    info = factors.cache_info()
+    report['caches'] = {'factors': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}}
+    for name, cache in (('results', results), ('scenarios', scenarios)):
+        with cache['lock']:
+            report['caches'][name] = {'hits': cache['hits'], 'misses': cache['misses'], 'size': len(cache['data'])}
+    return report
+
+#%% HTTP
+
+def _json_float(v):
+    v = float(v)
+    return v if math.isfinite(v) else None
+
+async def dispatch(method, path, body):
+    if method == 'GET' and path == '/health':
+        return 200, {'status': 'ok'}
+    if method == 'GET' and path == '/metrics':
+        return 200, metrics_report()
+    if method == 'POST' and path in ('/query', '/scenario'):
+        try:
+            request = json.loads(body or b'{}')
+            if path == '/query':
+                return 200, run_queries(request)
+            # Monte Carlo runs go to a worker thread so queries keep being answered meanwhile
+            return 200, await asyncio.get_running_loop().run_in_executor(None, run_scenario, request)
+        except Exception as e: # any bad request is answered with 400 (and counted), not a dropped connection
+            return 400, {'error': type(e).__name__ + ': ' + str(e)}
+    return 404, {'error': 'Unknown endpoint: ' + method + ' ' + path}
+
+async def handle(reader, writer):
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            method, path, _ = line.decode('latin-1').split()
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b'\n', b''):
+                    break
+                name, value = h.decode('latin-1').split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            t0 = time.perf_counter()
+            status, payload = await dispatch(method, path, body)
+            data = json.dumps(payload).encode('utf-8')
+            _record(path, time.perf_counter() - t0, status == 200)
+
+            writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                         % (status, reasons[status].encode(), len(data)) + data)
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def start(host=host, port=port):
+    return await asyncio.start_server(handle, host, port)
+
+async def _serve(host, port):
+    server = await start(host, port)
+    print('Serving on http://%s:%d' % (host, port))
+    async with server:
+        await server.serve_forever()
+
+def serve(host=host, port=port):
+    asyncio.run(_serve(host, port))
+
+if __name__ == '__main__':
+    serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else port)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:33:20 2026
+
+@author: mcustado
+"""
+import os
+import sys
+import json
+import time
+import socket
+import multiprocessing
+import numpy as np
+import lake_balance_montecarlo as lbm
+import lake_balance_results as lbr
+
+########## Sharded Monte Carlo runs over a shared job directory #################
+
+# Splits a lake_balance_montecarlo run into shards (contiguous ranges of its blocks) that workers on any node can
+# execute from a shared job directory:
+    # <job>/spec.json       run specification, histogram ranges and shard list (written once by create_job)
+    # <job>/locks/<shard>   claim files, created atomically (O_CREAT | O_EXCL) by the worker running the shard
+    # <job>/parts/<shard>.npz   partial statistics of a finished shard (and its outputs, if keep_values)
+
+# Block b of a run always uses the random stream SeedSequence(seed, spawn_key=(b,)) and the histogram ranges are
+# fixed in the specification from block 0, exactly as in lbm.run_ensemble. Merging the parts therefore gives the
+# single-node result: identical counts, minimum, maximum, histogram percentiles and (with keep_values) identical
+# outputs; means and standard deviations agree to floating point rounding of the merge order.
+
+#%% Job specification
+
+def _shard_name(i):
+    return 'shard_%05d' % i
+
+# Create a job directory. Arguments as lbm.run_ensemble; shard_blocks: number of blocks per shard
+# keep_values: also store the outputs of every draw in the parts (for exact percentiles or further analysis)
+
+def create_job(job_dir, iso, inputs, sim, k=1, total_inflow=None, dtype='float64', chunk=10**6, seed=None,
+               quantiles=lbr.default_quantiles, bins=2**14, margin=0.5, shard_blocks=1, keep_values=False, **labels):
+    seed = np.random.SeedSequence().entropy if seed is None else seed
+    n_blocks = -(-sim//chunk)
+
+    # Histogram ranges from block 0, as in lbm.run_ensemble
+    out = lbm.evaluate(iso, lbm.draw_block(seed, 0, inputs, min(chunk, sim), dtype), k, total_inflow)
+    ranges = {name: lbm.pilot_range(values, margin) for name, values in out.items()}
+
+    spec = {'iso': iso, 'inputs': inputs, 'sim': sim, 'k': k, 'total_inflow': total_inflow, 'dtype': str(np.dtype(dtype)),
+            'chunk': chunk, 'seed': seed, 'quantiles': list(quantiles), 'bins': bins, 'ranges': ranges,
+            'keep_values': keep_values, 'labels': labels,
+            'shards': [[b, min(b + shard_blocks, n_blocks)] for b in range(0, n_blocks, shard_blocks)]}
+
+    os.makedirs(os.path.join(job_dir, 'locks'), exist_ok=True)
+    os.makedirs(os.path.join(job_dir, 'parts'), exist_ok=True)
+    with open(os.path.join(job_dir, 'spec.json'), 'w') as f:
+        json.dump(spec, f, indent=1)
+    return spec
+
+def load_spec(job_dir):
+    with open(os.path.join(job_dir, 'spec.json')) as f:
+        return json.load(f)
+
+def _part_path(job_dir, i):
+    return os.path.join(job_dir, 'parts', _shard_name(i) + '.npz')
+
+def _lock_path(job_dir, i):
+    return os.path.join(job_dir, 'locks', _shard_name(i))
+
+#%% Claiming shards
+
+def claim(job_dir, i):
+    try:
+        fd = os.open(_lock_path(job_dir, i), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write('%s %d %f' % (socket.gethostname(), os.getpid(), time.time()))
+    return True
+
+# Release claims older than timeout (s) whose shard has no part (e.g. the worker's node died)
+
+def release_stale(job_dir, timeout=3600):
+    released = []
+    for i in range(len(load_spec(job_dir)['shards'])):
+        lock = _lock_path(job_dir, i)
+        if os.path.exists(lock) and not os.path.exists(_part_path(job_dir, i)):
+            if time.time() - os.path.getmtime(lock) > timeout:
+                os.remove(lock)
+                released.append(i)
+    return released
+
+def status(job_dir):
+    n = len(load_spec(job_dir)['shards'])
+    done = [i for i in range(n) if os.path.exists(_part_path(job_dir, i))]
+    running = [i for i in range(n) if os.path.exists(_lock_path(job_dir, i)) and i not in done]
+    return {'shards': n, 'done': len(done), 'running': running}
+
+#%% Worker
+
+def run_shard(job_dir, i, spec=None):
+    spec = load_spec(job_dir) if spec is None else spec
+    first, last = spec['shards'][i]
+    names = list(spec['ranges'])
+    accs = {name: lbm.new_accumulator(*spec['ranges'][name], spec['bins']) for name in names}
+    values = {name: [] for name in names}
+
+    for block in range(first, last):
+        n = min(spec['chunk'], spec['sim'] - block*spec['chunk'])
+        draws = lbm.draw_block(spec['seed'], block, spec['inputs'], n, spec['dtype'])
+        out = lbm.evaluate(spec['iso'], draws, spec['k'], spec['total_inflow'])
+        for name in names:
+            lbm.accumulate(accs[name], out[name])
+            if spec['keep_values']:
+                values[name].append(out[name])
+
+    arrays = {}
+    for name in names:
+        acc = accs[name]
+        arrays[name + '_moments'] = np.array([acc['n'], acc['n_nan'], acc['mean'], acc['m2'], acc['min'], acc['max']])
+        arrays[name + '_counts'] = acc['counts']
+        if spec['keep_values']:
+            arrays[name + '_values'] = np.concatenate(values[name])
+
+    # Write under a temporary name and rename, so a part is either complete or absent
+    tmp = _part_path(job_dir, i) + '.%d.tmp.npz' % os.getpid()
+    np.savez(tmp, **arrays)
+    os.replace(tmp, _part_path(job_dir, i))
+
+# Run shards until none are left to claim. Returns the shards run by this worker
+
+def work(job_dir, max_shards=None):
+    spec = load_spec(job_dir)
+    ran = []
+    for i in range(len(spec['shards'])):
+        if max_shards is not None and len(ran) >= max_shards:
+            break
+        if os.path.exists(_part_path(job_dir, i)) or not claim(job_dir, i):
+            continue
+        run_shard(job_dir, i, spec)
+        ran.append(i)
+    return ran
+
+# Local stand-in for a cluster queue: several worker processes on this machine
+
+def run_local(job_dir, workers=None):
+    workers = workers or os.cpu_count()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers) as pool:
+        ran = pool.map(work, [job_dir]*workers)
+    return ran
+
+#%% Merge
+
+# Combine all parts into summary records (as lbm.run_ensemble) and, if the job kept them, the outputs of every draw
+
+def merge(job_dir):
+    spec = load_spec(job_dir)
+    names = list(spec['ranges'])
+    missing = [i for i in range(len(spec['shards'])) if not os.path.exists(_part_path(job_dir, i))]
+    if missing:
+        raise RuntimeError('Shards not finished: ' + ', '.join(_shard_name(i) for i in missing))
+
+    accs = {name: lbm.new_accumulator(*spec['ranges'][name], spec['bins']) for name in names}
+    values = {name: [] for name in names}
+    for i in range(len(spec['shards'])):
+        with np.load(_part_path(job_dir, i)) as part:
+            for name in names:
+                n, n_nan, mean, m2, vmin, vmax = part[name + '_moments']
+                lbm.merge_accumulators(accs[name], {'n': int(n), 'n_nan': int(n_nan), 'mean': mean, 'm2': m2,
+                                                    'min': vmin, 'max': vmax, 'counts': part[name + '_counts']})
+                if spec['keep_values']:
+                    values[name].append(part[name + '_values'])
+
+    records = []
+    for name in names:
+        rec = dict(iso=spec['iso'], **spec['labels'])
+        rec['variable'] = name
+        rec.update(lbm.finalize(accs[name], spec['quantiles']))
+        records.append(rec)
+
+    result = {'records': records}
+    if spec['keep_values']:
+        result['values'] = {name: np.concatenate(values[name]) for name in names}
+    return result
+
+#%% Command line: python lake_balance_shards.py work|status|merge|release <job_dir>
+
+if __name__ == '__main__':
+    command, job_dir = sys.argv[1], sys.argv[2]
+    if command == 'work':
+        print('shards run:', work(job_dir))
+    elif command == 'status':
+        print(status(job_dir))
+    elif command == 'release':
+        print('released:', release_stale(job_dir))
+    elif command == 'merge':
+        quantiles = load_spec(job_dir)['quantiles']
+        for rec in merge(job_dir)['records']:
+            lbr.print_record(rec, quantiles)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:44:42 2026
+
+@author: mcustado
+"""
+import os
+import atexit
+import contextlib
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import lake_balance_montecarlo as lbm
+
+########## Shared-memory ensembles for parallel workers #################
+
+# Input and output arrays of an ensemble (hum_dist, temp_dist, dX_S_dist, ..., x_dist) are allocated once in shared
+# memory segments. Workers receive only a small handle (segment names, shapes and dtypes), attach to the segments
+# once when the pool starts and read/write their slices as numpy views: nothing is pickled or copied back, and memory
+# use does not grow with the number of workers.
+
+# Segments belong to the process that created them. They are unlinked when the shared_ensemble block exits (also
+# when the run fails or is interrupted), by release(), or at interpreter exit for anything still open. Workers only
+# close their views. If the owner is killed, the multiprocessing resource tracker unlinks the segments.
+# Copy any array needed after the block (views into released segments stay valid only while referenced).
+
+# An ensemble is a dict: {'layout': {name: (segment name, shape, dtype)}, 'arrays': {name: view}, 'segments': [...]}
+# handle(ensemble) is the picklable part (layout) passed to workers.
+
+input_names = ['h', 'temp', 'dX_P', 'dX_S', 'dX_I']
+
+_owned = {}
+_in_use = [] # closed while views were still referenced
+
+#%% Segments
+
+# frombuffer keeps the segment's buffer exported while the array (or any view of it) exists, so closing the segment
+# under a live array fails with BufferError instead of unmapping memory that is still in use
+
+def _view(seg, shape, dtype):
+    return np.frombuffer(seg.buf, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+# Allocate one segment per array. spec: {name: (shape, dtype)}
+
+def create(spec):
+    ens = {'layout': {}, 'arrays': {}, 'segments': []}
+    try:
+        for name, (shape, dtype) in spec.items():
+            shape = (shape,) if np.isscalar(shape) else tuple(shape)
+            dtype = np.dtype(dtype)
+            seg = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))*dtype.itemsize))
+            _owned[seg.name] = seg
+            ens['segments'].append(seg)
+            ens['layout'][name] = (seg.name, shape, dtype.str)
+            ens['arrays'][name] = _view(seg, shape, dtype)
+    except BaseException:
+        release(ens)
+        raise
+    return ens
+
+# Copy existing arrays (e.g. the input distributions of the uncertainty script) into a new shared ensemble, with
+# extra empty arrays (outputs): {name: (shape, dtype)}
+
+def from_arrays(arrays, outputs=None):
+    arrays = {name: np.asarray(v) for name, v in arrays.items()}
+    spec = {name: (v.shape, v.dtype) for name, v in arrays.items()}
+    spec.update(outputs or {})
+    ens = create(spec)
+    for name, v in arrays.items():
+        ens['arrays'][name][...] = v
+    return ens
+
+def handle(ens):
+    return {'layout': dict(ens['layout'])}
+
+# Views on the segments of a handle (in a worker). Returns an ensemble that is closed with detach()
+
+def attach(h):
+    ens = {'layout': h['layout'], 'arrays': {}, 'segments': []}
+    try:
+        for name, (seg_name, shape, dtype) in h['layout'].items():
+            seg = shared_memory.SharedMemory(name=seg_name)
+            ens['segments'].append(seg)
+            ens['arrays'][name] = _view(seg, shape, np.dtype(dtype))
+    except BaseException:
+        detach(ens)
+        raise
+    return ens
+
+def _close(seg):
+    try:
+        seg.close()
+    except BufferError: # views kept by the caller; the mapping stays until the interpreter exits
+        _in_use.append(seg)
+
+def detach(ens):
+    ens['arrays'].clear()
+    for seg in ens['segments']:
+        _close(seg)
+    ens['segments'] = []
+
+# Close and unlink the segments of an ensemble created in this process (safe to call more than once)
+
+def release(ens):
+    ens['arrays'].clear()
+    for seg in ens['segments']:
+        _close(seg)
+        if _owned.pop(seg.name, None) is not None:
+            try:
+                seg.unlink()
+            except FileNotFoundError:
+                pass
+    ens['segments'] = []
+
+@atexit.register
+def _release_all():
+    release({'arrays': {}, 'segments': list(_owned.values())})
+
+@contextlib.contextmanager
+def shared_ensemble(spec=None, arrays=None, outputs=None):
+    ens = from_arrays(arrays, outputs) if arrays is not None else create(spec)
+    try:
+        yield ens
+    finally:
+        release(ens)
+
+#%% Workers
+
+_worker = {}
+
+def _init(h):
+    _worker['ens'] = attach(h)
+
+def _store(out, sl):
+    arrays = _worker['ens']['arrays']
+    for name, values in out.items():
+        if name in arrays:
+            arrays[name][sl] = values
+
+def _evaluate_slice(iso, k, total_inflow, start, stop):
+    arrays = _worker['ens']['arrays']
+    sl = slice(start, stop)
+    draws = {name: arrays[name][sl] for name in input_names}
+    _store(lbm.evaluate(iso, draws, k, total_inflow), sl)
+
+def _ensemble_block(iso, inputs, k, total_inflow, dtype, seed, chunk, sim, block):
+    start = block*chunk
+    sl = slice(start, min(start + chunk, sim))
+    draws = lbm.draw_block(seed, block, inputs, sl.stop - start, dtype)
+    _store(draws, sl)
+    _store(lbm.evaluate(iso, draws, k, total_inflow), sl)
+
+def _pool(ens, processes):
+    ctx = multiprocessing.get_context('spawn')
+    return ctx.Pool(processes or os.cpu_count(), initializer=_init, initargs=(handle(ens),))
+
+def _outputs(sim, total_inflow, dtype):
+    names = [name for name in lbm.output_names if name != 'E' or total_inflow is not None]
+    return {name: (sim, dtype) for name in names}
+
+#%% Runs
+
+# Evaluate the forward model on an ensemble whose inputs h, temp, dX_P, dX_S, dX_I are filled in (e.g. from
+# from_arrays) and whose outputs X, dX_E, dX_A (and E) are allocated; outputs are written in place
+
+def evaluate(ens, iso, k=1, total_inflow=None, processes=None, chunk=10**5):
+    sim = ens['arrays']['X'].shape[0]
+    tasks = [(iso, k, total_inflow, start, min(start + chunk, sim)) for start in range(0, sim, chunk)]
+    with _pool(ens, processes) as pool:
+        pool.starmap(_evaluate_slice, tasks)
+    return ens
+
+# Draw and evaluate sim members of an input specification (lake_balance_montecarlo) in the workers, straight into
+# the shared arrays. Block b uses the same random stream as in lbm.run_ensemble, so the values equal
+# run_ensemble(..., exact=True) with the same seed and chunk
+
+def ensemble(ens, iso, inputs, k=1, total_inflow=None, processes=None, chunk=10**5, seed=0):
+    sim = ens['arrays']['X'].shape[0]
+    dtype = ens['arrays']['X'].dtype.str
+    tasks = [(iso, inputs, k, total_inflow, dtype, seed, chunk, sim, block) for block in range(-(-sim//chunk))]
+    with _pool(ens, processes) as pool:
+        pool.starmap(_ensemble_block, tasks)
+    return ens
+
+# Ensemble specification with inputs and outputs of sim members
+
+def ensemble_spec(sim, total_inflow=None, dtype='float64'):
+    spec = {name: (sim, dtype) for name in input_names}
+    spec.update(_outputs(sim, total_inflow, dtype))
+    return spec
+
+# Convenience wrapper for arrays held by the scripts (hum_dist, temp_dist, dX_P_dist, dX_S_dist, dX_I_dist).
+# Returns private copies of the outputs; the shared segments are released before returning
+
+def run(iso, h, temp, dX_P, dX_S, dX_I, k=1, total_inflow=None, processes=None, chunk=10**5):
+    arrays = dict(zip(input_names, np.broadcast_arrays(h, temp, dX_P, dX_S, dX_I)))
+    sim = arrays['h'].size
+    with shared_ensemble(arrays={name: np.ravel(v) for name, v in arrays.items()},
+                         outputs=_outputs(sim, total_inflow, 'float64')) as ens:
+        evaluate(ens, iso, k, total_inflow, processes, chunk)
+        return {name: ens['arrays'][name].copy() for name in _outputs(sim, total_inflow, 'float64')}
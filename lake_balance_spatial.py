@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:26:34 2026
+
+@author: mcustado
+"""
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gp
+import shapely
+from scipy.spatial import cKDTree
+
+########## Spatial assignment of samples to basins and nearest gauges #################
+
+# Tags every row of the master list with the HUC12 basin that contains it and the nearest hydrological station
+# in stations_used.csv. The basin layer is indexed once with an STRtree and the stations with a KD-tree (on unit
+# vectors, so chord distances convert exactly to great-circle distances). Assignments are persisted in a CSV keyed
+# by a hash of each row's ID, date and coordinates. Every stored basin and station assignment is stamped with a hash
+# of the basin layer and station list it came from, so an update only processes new rows and rows whose stamp no
+# longer matches the current inputs (including rows stored without basins when basins are now given).
+
+earth_radius_km = 6371.0088
+
+assignment_columns = ['row_key', 'huc12', 'basin_name', 'basin_key', 'station', 'station_distance_km', 'station_key']
+
+# Indexes built in this session, keyed by source file and modification time
+
+_index_cache = {}
+
+#%% Inputs
+
+def load_master(path='BL_master_list.csv'):
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+def load_stations(path='stations_used.csv'):
+    stations = pd.read_csv(path, encoding='utf-8-sig', dtype={'Sample ID': str})
+    stations['Sample ID'] = stations['Sample ID'].str.strip().str.replace('\xa0', '')
+    return stations.dropna(subset=['Lat', 'Lon'])
+
+# Stable key for a master list row
+
+def row_keys(df):
+    rows = df[['Sample_ID', 'Sample_Collection_Date', 'Lat', 'Lon']].astype(object).to_numpy()
+    keys = [hashlib.sha1('|'.join(str(v) for v in row).encode('utf-8')).hexdigest()[:16] for row in rows]
+    return pd.Series(keys, index=df.index)
+
+# Hash of the inputs behind an index (changes when the stations or basins change)
+
+def _digest(*arrays):
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update('|'.join(str(v) for v in a).encode('utf-8') if a.dtype == object else np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()[:16]
+
+#%% Indexes
+
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)])
+
+def build_station_index(stations):
+    ids = stations['Sample ID'].to_numpy()
+    lat, lon = stations['Lat'].to_numpy(dtype=float), stations['Lon'].to_numpy(dtype=float)
+    return {'tree': cKDTree(_unit_vectors(lat, lon)), 'ids': ids, 'key': _digest(ids.astype(object), lat, lon)}
+
+# STRtree over the basin polygons (reprojected to WGS84 to match the sample coordinates)
+
+def build_basin_index(basins, id_col='huc12', name_col='name'):
+    if basins.crs is not None and basins.crs.to_epsg() != 4326:
+        basins = basins.to_crs(epsg=4326)
+    geoms = basins.geometry.to_numpy()
+    ids = basins[id_col].astype(str).to_numpy()
+    names = basins[name_col].astype(str).to_numpy()
+    return {'tree': shapely.STRtree(geoms), 'ids': ids, 'names': names,
+            'key': _digest(ids.astype(object), names.astype(object), shapely.to_wkb(geoms).astype(object))}
+
+# Basin index for a shapefile, built once per session (rebuilt if the file changes)
+
+def basin_index(path, id_col='huc12', name_col='name'):
+    key = (os.path.abspath(path), os.path.getmtime(path), id_col, name_col)
+    if key not in _index_cache:
+        _index_cache[key] = build_basin_index(gp.read_file(path), id_col, name_col)
+    return _index_cache[key]
+
+#%% Queries
+
+# Nearest station to each point. Returns station IDs and great-circle distances (km)
+
+def nearest_station(index, lat, lon):
+    chord, i = index['tree'].query(_unit_vectors(lat, lon))
+    dist = 2*earth_radius_km*np.arcsin(np.clip(chord/2, 0, 1))
+    return index['ids'][i], dist
+
+# Basin containing each point (first match where basins overlap; None outside the layer)
+
+def assign_basins(index, lat, lon):
+    points = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+    ids = np.full(len(points), None, dtype=object)
+    names = np.full(len(points), None, dtype=object)
+    pt, poly = index['tree'].query(points, predicate='within')
+    first = np.unique(pt, return_index=True)[1]
+    ids[pt[first]] = index['ids'][poly[first]]
+    names[pt[first]] = index['names'][poly[first]]
+    return ids, names
+
+#%% Persisted assignments
+
+# Assign basin and nearest station to every master list row without a stored assignment, or whose stored assignment
+# was made with other basins or stations, update the CSV store and return the master list with the assignment
+# columns attached.
+# basins: basin index (from basin_index/build_basin_index) or None to skip basin tagging (stored basins are kept)
+
+def update_assignments(master, store_path, basins=None, stations=None):
+    stations = load_stations() if stations is None else stations
+    station_index = build_station_index(stations)
+    keys = row_keys(master)
+
+    if os.path.exists(store_path):
+        store = pd.read_csv(store_path, dtype={'row_key': str, 'huc12': str, 'basin_key': str, 'station': str,
+                                               'station_key': str})
+        store = store.reindex(columns=assignment_columns) # stores without stamps are redone
+    else:
+        store = pd.DataFrame(columns=assignment_columns)
+
+    rows = master.assign(row_key=keys).drop_duplicates('row_key').set_index('row_key')
+    new = pd.DataFrame({'row_key': rows.index[~rows.index.isin(store['row_key'])]}, columns=assignment_columns)
+    store = (pd.concat([store, new], ignore_index=True) if len(store) else new).set_index('row_key')
+    store['station_distance_km'] = store['station_distance_km'].astype(float)
+
+    in_master = store.index.isin(rows.index)
+    redo_station = in_master & (store['station_key'] != station_index['key']).to_numpy()
+    if basins is not None:
+        redo_basin = in_master & (store['basin_key'] != basins['key']).to_numpy()
+    else:
+        redo_basin = np.zeros(len(store), dtype=bool)
+
+    if redo_station.any() or redo_basin.any():
+        coords = rows.reindex(store.index)[['Lat', 'Lon']]
+        located = (coords['Lat'].notna() & coords['Lon'].notna()).to_numpy()
+
+        sel = redo_station & located
+        if sel.any():
+            sid, dist = nearest_station(station_index, coords['Lat'].to_numpy()[sel], coords['Lon'].to_numpy()[sel])
+            store.loc[sel, 'station'] = sid
+            store.loc[sel, 'station_distance_km'] = dist
+        store.loc[redo_station, 'station_key'] = station_index['key']
+
+        sel = redo_basin & located
+        if sel.any():
+            huc, name = assign_basins(basins, coords['Lat'].to_numpy()[sel], coords['Lon'].to_numpy()[sel])
+            store.loc[sel, 'huc12'] = huc
+            store.loc[sel, 'basin_name'] = name
+        if redo_basin.any():
+            store.loc[redo_basin, 'basin_key'] = basins['key']
+
+        store = store.reset_index()
+        store.to_csv(store_path, index=False)
+    else:
+        store = store.reset_index()
+
+    return master.assign(row_key=keys).merge(store, on='row_key', how='left')
+
+# Basin-level isotope statistics from a tagged master list
+
+def basin_summary(tagged, by='huc12', values=('d18O', 'dD', 'd_excess')):
+    return tagged.groupby(by)[list(values)].agg(['count', 'mean', 'std'])
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:47:18 2026
+
+@author: mcustado
+"""
+import os
+import json
+import itertools
+import numpy as np
+from scipy.ndimage import maximum_filter
+import lake_balance_functions as lbf
+
+########## Precomputed response-surface tables of X #################
+
+# X (E_I through lbf.forward_model) is tabulated once per isotope on a regular grid of humidity, temperature, dX_P,
+# dX_S and dX_I and stored as .npy files that are memory-mapped when loaded, so a lookup only reads the grid nodes
+# around the requested points. Points are interpolated multilinearly or with tensor-product cubic (4-point Lagrange)
+# interpolation; both are local, so one lookup costs 2^5 or 4^5 table reads per point, whatever the grid size.
+
+# Every grid cell carries an error estimate for each method, computed at build time from finite differences of the
+# tabulated values along each axis (h: grid step):
+    # linear: sum over axes of max|d2f/dx2|*h^2/8, with h^2*d2f/dx2 taken as the largest second difference at the
+    #   corners of the cell
+    # cubic: sum over axes of c*max|d4f/dx4|*h^4, from fourth differences, with c = 3/128 for the centered stencil
+    #   and 1/24 in the first and last cell of an axis (one-sided stencil); the maximum is taken over the cell and
+    #   its neighbours, which the stencil also covers
+# times a safety factor (default 2). The estimates hold as long as the derivatives do not change much within a cell;
+# check() compares lookups against direct evaluation at random points. Float32 tables add their rounding error.
+
+# E_I has a pole where its denominator vanishes (lake_balance_inverse.pole_humidity): at high humidity for lakes that
+# are enriched relative to precipitation (h ~ 0.73 for d18O and ~ 0.6 for dD within the isotope ranges below). The
+# default humidity ranges stop short of it. Tables can be built over wider domains; cells next to a pole get
+# non-finite or very large error estimates, so such lookups are flagged rather than silently wrong.
+
+axes_names = ['hum', 'temp', 'dX_P', 'dX_S', 'dX_I']
+
+default_domain = {'d18O': {'hum': (0.4, 0.7), 'temp': (-10, 20), 'dX_P': (-14, -9.5), 'dX_S': (-15, -5),
+                           'dX_I': (-18.5, -14)},
+                  'dD': {'hum': (0.4, 0.55), 'temp': (-10, 20), 'dX_P': (-110, -70), 'dX_S': (-120, -50),
+                         'dX_I': (-140, -105)}}
+
+default_points = {'hum': 31, 'temp': 16, 'dX_P': 7, 'dX_S': 21, 'dX_I': 7}
+
+#%% Building and loading
+
+def _axes(meta):
+    return [np.linspace(*meta['domain'][name], meta['points'][name]) for name in axes_names]
+
+# Largest |difference| of the given order along axis at every node (edge nodes take the nearest interior value)
+
+def _node_differences(values, axis, order):
+    d = np.abs(np.diff(values, n=order, axis=axis))
+    pad = [(0, 0)]*values.ndim
+    pad[axis] = (order//2, order - order//2)
+    return np.pad(d, pad, mode='edge')
+
+# Maximum of a node array over the 2^D corners of every cell
+
+def _cell_max(node):
+    out = node
+    for axis in range(node.ndim):
+        a = np.moveaxis(out, axis, 0)
+        out = np.moveaxis(np.maximum(a[:-1], a[1:]), 0, axis)
+    return out
+
+def _error_tables(values, positive, safety):
+    err_lin = np.zeros(tuple(n - 1 for n in values.shape))
+    err_cub = np.zeros_like(err_lin)
+    with np.errstate(invalid='ignore', over='ignore'):
+        for axis, n in enumerate(values.shape):
+            err_lin += _cell_max(_node_differences(values, axis, 2))/8
+            c = np.full(n - 1, 3/128)
+            c[[0, -1]] = 1/24
+            shape = [1]*values.ndim
+            shape[axis] = n - 1
+            err_cub += c.reshape(shape)*_cell_max(_node_differences(values, axis, 4))
+    # Cells crossed by the pole (denominator of E_I changes sign between corners)
+    # (the cubic stencil reaches up to two cells away, so its estimates take the neighbouring cells into account)
+    pole = _cell_max(positive) & _cell_max(~positive)
+    err_lin[pole] = np.inf
+    err_cub = maximum_filter(err_cub, size=3, mode='nearest')
+    err_cub[maximum_filter(pole, size=5, mode='nearest')] = np.inf
+    # Rounding of the stored values
+    rounding = np.finfo(values.dtype).eps*np.nanmax(np.abs(values[np.isfinite(values)]))
+    err_lin = np.where(np.isfinite(err_lin), safety*err_lin + rounding, np.inf)
+    err_cub = np.where(np.isfinite(err_cub), safety*err_cub + rounding, np.inf)
+    return err_lin.astype(np.float32), err_cub.astype(np.float32)
+
+# Tabulate X for one isotope in the folder path (created if needed). domain: {axis: (low, high)} and points:
+# {axis: number of nodes (at least 5)} replace the defaults per axis. k: seasonality factor.
+# dtype = 'float32' halves the table size (rounding error is added to the error estimates). Returns the loaded table
+
+def build(path, iso='d18O', domain=None, points=None, k=1, dtype='float64', safety=2.0):
+    meta = {'iso': iso, 'k': k, 'dtype': np.dtype(dtype).name, 'safety': safety,
+            'domain': dict(default_domain[iso], **(domain or {})),
+            'points': dict(default_points, **(points or {}))}
+    if min(meta['points'].values()) < 5:
+        raise ValueError('Every axis needs at least 5 points')
+    os.makedirs(path, exist_ok=True)
+    hum, temp, dX_P, dX_S, dX_I = _axes(meta)
+    shape = tuple(meta['points'][name] for name in axes_names)
+
+    values = np.lib.format.open_memmap(os.path.join(path, 'X.npy'), mode='w+', dtype=meta['dtype'], shape=shape)
+    positive = np.empty(shape, dtype=bool) # sign of the denominator of E_I
+    t, p, s, i_ = temp[:, None, None, None], dX_P[None, :, None, None], dX_S[None, None, :, None], dX_I[None, None, None, :]
+    for i, h in enumerate(hum): # one humidity slice at a time
+        alfa, ep_eq, ep_k = lbf.frac_factors(iso, t, h)
+        dX_A = lbf.isotope_atm(p, ep_eq, k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[i] = lbf.E_I(h, ep_k, ep_eq, alfa, dX_A, s, i_)
+        positive[i] = h*(dX_A - s) + (ep_k + ep_eq/alfa)*(1 + 0.001*s) > 0
+    values.flush()
+
+    err_lin, err_cub = _error_tables(np.asarray(values), positive, safety)
+    np.save(os.path.join(path, 'err_linear.npy'), err_lin)
+    np.save(os.path.join(path, 'err_cubic.npy'), err_cub)
+    meta['max_error'] = {'linear': float(err_lin.max()), 'cubic': float(err_cub.max())}
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    del values
+    return load(path)
+
+def load(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    table = {'meta': meta, 'axes': _axes(meta)}
+    for name in ('X', 'err_linear', 'err_cubic'):
+        table[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+    return table
+
+#%% Lookup
+
+# Fractional grid coordinates of the points (m x 5) and whether they are inside the domain
+
+def _coordinates(table, points):
+    u = np.empty_like(points)
+    inside = np.ones(points.shape[0], dtype=bool)
+    for d, ax in enumerate(table['axes']):
+        u[:, d] = (points[:, d] - ax[0])/(ax[1] - ax[0])
+        tol = 1e-9*(ax.size - 1)
+        inside &= (u[:, d] >= -tol) & (u[:, d] <= ax.size - 1 + tol)
+    return u, inside
+
+def _lagrange_weights(s):
+    return np.stack([-(s - 1)*(s - 2)*(s - 3)/6, s*(s - 2)*(s - 3)/2, -s*(s - 1)*(s - 3)/2, s*(s - 1)*(s - 2)/6],
+                    axis=-1)
+
+# Interpolated X at the points given by the inputs (scalars or arrays, broadcast together).
+# method: 'linear' or 'cubic'. Returns dict with X (NaN outside the domain), error (estimated maximum absolute
+# error, inf outside the domain) and inside
+
+def lookup(table, hum, temp, dX_P, dX_S, dX_I, method='linear', chunk=4096):
+    arrays = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (hum, temp, dX_P, dX_S, dX_I)])
+    shape = arrays[0].shape
+    points = np.stack([a.ravel() for a in arrays], axis=1)
+    u, inside = _coordinates(table, points)
+
+    sizes = np.array(table['X'].shape)
+    strides = np.cumprod(np.concatenate([sizes[1:], [1]])[::-1])[::-1]
+    flat = table['X'].reshape(-1)
+    x_ = np.full(points.shape[0], np.nan)
+    err = np.full(points.shape[0], np.inf)
+    width = 2 if method == 'linear' else 4
+    offsets = np.array(list(itertools.product(range(width), repeat=sizes.size))) @ strides # all stencil nodes
+
+    for start in range(0, points.shape[0], chunk):
+        sl = slice(start, start + chunk)
+        uu = u[sl]
+        cell = np.clip(np.floor(uu).astype(int), 0, sizes - 2)
+        if method == 'linear':
+            first = cell
+            t = uu - cell
+            w = np.stack([1 - t, t], axis=-1) # (m, 5, 2)
+        else:
+            first = np.clip(cell - 1, 0, sizes - 4)
+            w = _lagrange_weights(uu - first) # (m, 5, 4)
+
+        # Values at the stencil nodes (m, width, ..., width), contracted one axis at a time
+        v = flat[(first @ strides)[:, None] + offsets[None, :]].reshape((-1,) + (width,)*sizes.size)
+        for d in range(sizes.size):
+            v = np.einsum('mi...,mi->m...', v, w[:, d])
+        x_[sl] = v
+        err[sl] = table['err_' + method][tuple(cell.T)]
+
+    x_[~inside] = np.nan
+    err[~inside] = np.inf
+    return {'X': x_.reshape(shape), 'error': err.reshape(shape), 'inside': inside.reshape(shape)}
+
+#%% Validation
+
+# Lookups at n random points of the domain against lbf.forward_model.
+# Returns the largest absolute error, the largest ratio of error to estimate and the share of points above it
+
+def check(table, n=100000, method='linear', seed=None):
+    meta = table['meta']
+    rng = np.random.default_rng(seed)
+    pts = [rng.uniform(*meta['domain'][name], n) for name in axes_names]
+    out = lookup(table, *pts, method=method)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ref = lbf.forward_model(meta['iso'], pts[0], pts[1], pts[2], pts[3], pts[4], meta['k'])[2]
+        actual = np.abs(out['X'] - ref)
+        ratio = actual/out['error']
+    return {'max_error': float(np.nanmax(actual)), 'max_estimate': float(np.max(out['error'])),
+            'max_ratio': float(np.nanmax(ratio)), 'exceeded': float(np.mean(ratio > 1))}
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:41:34 2026
+
+@author: mcustado
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import lake_balance_functions as lbf
+
+########## Threaded chunked evaluation of the lake balance kernels #################
+
+# The kernels in lake_balance_functions are chains of numpy operations: on a large ensemble each operation runs on one
+# core and creates a full-size temporary array. Here the (broadcast, flattened) inputs are cut into chunks of a few
+# tens of thousands of elements, which keeps the temporaries of one chunk in cache, and the chunks are evaluated on a
+# thread pool. numpy releases the GIL inside its array operations, so the threads run in parallel without starting
+# processes or pickling the inputs (useful for 10^6-10^7 draws in an interactive session).
+
+# Every element goes through the same numpy operations as in the serial call, and chunk boundaries are multiples of
+# 64 elements (SIMD lanes see the same elements), so results are bitwise identical to the serial kernels for any
+# number of threads and chunk size. numexpr is not used for this reason: its transcendental functions and fused
+# expressions round differently from numpy.
+
+# threads = None uses all cores (os.cpu_count()); threads = 1 evaluates the chunks in order in the calling thread
+
+default_chunk = 2**15
+
+_pools = {}
+
+def _pool(threads):
+    if threads not in _pools:
+        _pools[threads] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='lake_balance')
+    return _pools[threads]
+
+#%% Chunked evaluation
+
+# Evaluate func(*args) chunk by chunk. args: arrays (broadcast together) or scalars; non-array arguments (e.g. the
+# isotope name) are passed through. func must work elementwise and return an array or a tuple of arrays.
+# Returns the same as func on the full arrays
+
+def apply(func, *args, chunk=default_chunk, threads=None):
+    threads = (os.cpu_count() or 1) if threads is None else threads
+    chunk = max(64, chunk - chunk % 64)
+    is_array = [isinstance(a, np.ndarray) or isinstance(a, (list, tuple)) for a in args]
+    arrays = [np.asarray(a) for a, arr in zip(args, is_array) if arr]
+    shape = np.broadcast_shapes(*[a.shape for a in arrays]) if arrays else ()
+    n = int(np.prod(shape))
+    if n <= chunk:
+        return func(*args)
+
+    flat = iter([np.ascontiguousarray(np.broadcast_to(a, shape)).ravel() for a in arrays])
+    args = [next(flat) if arr else a for a, arr in zip(args, is_array)]
+    bounds = [(start, min(start + chunk, n)) for start in range(0, n, chunk)]
+
+    def run(bound):
+        sl = slice(*bound)
+        return func(*[a[sl] if arr else a for a, arr in zip(args, is_array)])
+
+    # First chunk in this thread, to find the number and dtypes of the outputs
+    first = run(bounds[0])
+    single = not isinstance(first, tuple)
+    out = [np.empty(n, dtype=np.result_type(f)) for f in ((first,) if single else first)]
+
+    # res: outputs of one chunk as returned by func (wrapped here, once, when func returns a single array)
+    def store(bound, res):
+        for o, r in zip(out, (res,) if single else res):
+            o[bound[0]:bound[1]] = r
+
+    store(bounds[0], first)
+    if threads <= 1:
+        for bound in bounds[1:]:
+            store(bound, run(bound))
+    else:
+        for bound, res in zip(bounds[1:], _pool(threads).map(run, bounds[1:])):
+            store(bound, res)
+
+    out = [o.reshape(shape) for o in out]
+    return out[0] if single else tuple(out)
+
+#%% Kernels
+
+# Same as lbf.forward_model: returns dX_A, dX_E, X
+
+def forward_model(iso, h, temp, dX_P, dX_S, dX_I, k=1, chunk=default_chunk, threads=None):
+    return apply(lbf.forward_model, iso, h, temp, dX_P, dX_S, dX_I, k, chunk=chunk, threads=threads)
+
+# Same as lbf.E_I, from the climate and isotope inputs (X only)
+
+def _x(iso, h, temp, dX_P, dX_S, dX_I, k):
+    alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, h)
+    dX_A = lbf.isotope_atm(dX_P, ep_eq, k)
+    return lbf.E_I(h, ep_k, ep_eq, alfa, dX_A, dX_S, dX_I)
+
+def calc_x(iso, h, temp, dX_P, dX_S, dX_I, k=1, chunk=default_chunk, threads=None):
+    return apply(_x, iso, h, temp, dX_P, dX_S, dX_I, k, chunk=chunk, threads=threads)
+
+# Same as lbf.mass_balance_ssx from the climate inputs: returns dX_LS, limit
+
+def _ssx(iso, h, temp, dX_P, dX_I, x, k):
+    alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, h)
+    dX_A = lbf.isotope_atm(dX_P, ep_eq, k)
+    return lbf.mass_balance_ssx(h, ep_k, ep_eq, alfa, dX_A, dX_I, x)
+
+def steady_state(iso, h, temp, dX_P, dX_I, x, k=1, chunk=default_chunk, threads=None):
+    return apply(_ssx, iso, h, temp, dX_P, dX_I, x, k, chunk=chunk, threads=threads)
+
+#%% Validation
+
+# Threaded kernels against the serial lake_balance_functions calls on n random inputs (n > chunk, so several
+# chunks are evaluated), with threads = 1 and with a pool. Returns, per kernel and thread count, whether the
+# results are bitwise identical (NaNs compared as equal)
+
+def check(iso='d18O', n=10**6, chunk=1000, threads=(1, 2), seed=None):
+    rng = np.random.default_rng(seed)
+    h, temp = rng.uniform(0.4, 0.9, n), rng.uniform(-10, 20, n)
+    dX_P, dX_S, dX_I = rng.uniform(-13, -10, n), rng.uniform(-12, -6, n), rng.uniform(-18, -14, n)
+    x = rng.uniform(0.05, 0.95, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ref_fm = lbf.forward_model(iso, h, temp, dX_P, dX_S, dX_I, 1)
+        ref = {'forward_model': ref_fm, 'calc_x': (ref_fm[2],), 'steady_state': _ssx(iso, h, temp, dX_P, dX_I, x, 1)}
+        out = {}
+        for t in threads:
+            res = {'forward_model': forward_model(iso, h, temp, dX_P, dX_S, dX_I, chunk=chunk, threads=t),
+                   'calc_x': (calc_x(iso, h, temp, dX_P, dX_S, dX_I, chunk=chunk, threads=t),),
+                   'steady_state': steady_state(iso, h, temp, dX_P, dX_I, x, chunk=chunk, threads=t)}
+            for name, values in res.items():
+                out[(name, t)] = all(np.array_equal(a, b, equal_nan=True) for a, b in zip(values, ref[name]))
+    return out
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:35:28 2026
+
+@author: mcustado
+"""
+import numpy as np
+import lake_balance_functions as lbf
+
+########## Evaporation trajectories on humidity x X grids #################
+
+# Steady-state lake composition (lbf.mass_balance_ssx) for every pair of humidity and X (evaporation/inflow) values,
+# for d18O and dD at once. Humidity runs along the first axis and X along the second, so each row of dX_LS_O/dX_LS_D
+# is the evaporation trajectory of one humidity (Figure 5) and any grid density costs one broadcast call.
+# Temperature, precipitation (through dX_A) and inflow are fixed; the kinetic enrichment follows the humidity.
+
+#%% Trajectories
+
+# hum, x: 1D arrays of humidity and X values
+# dX_P, dX_I: (d18O, dD) isotopic composition of precipitation and total inflow
+# Returns dict with the grid (hum, x), dX_LS_O, dX_LS_D (len(hum) x len(x)) and the enrichment limits limit_O,
+# limit_D (one per humidity)
+
+def trajectories(hum, x, temp, dX_P, dX_I, k=1):
+    h = np.asarray(hum, dtype=float)[:, None]
+    xx = np.asarray(x, dtype=float)[None, :]
+    out = {'hum': h[:, 0], 'x': xx[0]}
+    for iso, s, precip, influx in (('d18O', 'O', dX_P[0], dX_I[0]), ('dD', 'D', dX_P[1], dX_I[1])):
+        alfa, ep_eq, ep_k = lbf.frac_factors(iso, temp, h)
+        dX_A = lbf.isotope_atm(precip, ep_eq, k)
+        dX_LS, limit = lbf.mass_balance_ssx(h, ep_k, ep_eq, alfa, dX_A, influx, xx)
+        out['dX_LS_' + s] = dX_LS
+        out['limit_' + s] = limit[:, 0]
+    return out
+
+#%% Fitting observed lakes to the grid
+
+# Grid point (humidity, X) closest to each observed lake composition (lake_O, lake_D: scalars or 1D arrays).
+# Distances are in units of the analytical uncertainties sd_O, sd_D. Returns dict with hum, x, distance per lake
+
+def fit_to_grid(traj, lake_O, lake_D, sd_O=0.1, sd_D=1.0, chunk=256):
+    lake_O = np.atleast_1d(np.asarray(lake_O, dtype=float))
+    lake_D = np.atleast_1d(np.asarray(lake_D, dtype=float))
+    grid_O = traj['dX_LS_O'].ravel()
+    grid_D = traj['dX_LS_D'].ravel()
+
+    best = np.empty(lake_O.size, dtype=np.int64)
+    dist = np.empty(lake_O.size)
+    for start in range(0, lake_O.size, chunk): # bounds the (lakes x grid points) distance array
+        sl = slice(start, start + chunk)
+        d2 = ((grid_O[None, :] - lake_O[sl, None])/sd_O)**2 + ((grid_D[None, :] - lake_D[sl, None])/sd_D)**2
+        best[sl] = np.nanargmin(d2, axis=1)
+        dist[sl] = np.sqrt(d2[np.arange(best[sl].size), best[sl]])
+
+    i, j = np.unravel_index(best, traj['dX_LS_O'].shape)
+    return {'hum': traj['hum'][i], 'x': traj['x'][j], 'distance': dist}